@@ -0,0 +1,87 @@
+import collections
+import json
+import logging
+import logging.handlers
+import queue
+import tkinter as tk
+
+LOGGER_NAME = 'ndi_decoder_control'
+DEFAULT_SCREEN_LINES = 500
+DEFAULT_MAX_BYTES = 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+FLUSH_MS = 16  # At most one widget update per frame
+
+logger = logging.getLogger(LOGGER_NAME)
+logger.setLevel(logging.DEBUG)
+logger.propagate = False
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line, with any fields passed to add_log()
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', {}))
+        return json.dumps(entry)
+
+class LogBuffer(logging.Handler):
+    # Keeps the last max_lines formatted records and copies new ones into a
+    # tk.Text in batches, trimming it so the widget never grows past the buffer
+    def __init__(self, master, max_lines=DEFAULT_SCREEN_LINES, level=logging.INFO):
+        super().__init__(level)
+        self.master = master
+        self.lines = collections.deque(maxlen=max_lines)
+        self.pending = collections.deque(maxlen=max_lines)
+        self.text_widget = None
+        self.flush_job = None
+        self.setFormatter(logging.Formatter('[%(asctime)s] %(message)s', '%Y-%m-%d %H:%M:%S'))
+
+    def attach(self, text_widget):
+        # Called again when the admin panel rebuilds its widgets
+        self.text_widget = text_widget
+        self.pending.clear()
+        if self.lines:
+            text_widget.insert(tk.END, ''.join(self.lines))
+            text_widget.see(tk.END)
+
+    def emit(self, record):
+        line = self.format(record) + '\n'
+        self.lines.append(line)
+        self.pending.append(line)
+        if self.flush_job is None:
+            self.flush_job = self.master.after(FLUSH_MS, self.flush_pending)
+
+    def flush_pending(self):
+        self.flush_job = None
+        if self.text_widget is None or not self.pending:
+            return
+        batch = ''.join(self.pending)
+        self.pending.clear()
+        self.text_widget.insert(tk.END, batch)
+        excess = int(self.text_widget.index('end-1c').split('.')[0]) - 1 - self.lines.maxlen
+        if excess > 0:
+            self.text_widget.delete('1.0', f'{excess + 1}.0')
+        self.text_widget.see(tk.END)  # Scroll to the end
+
+def start_file_logging(path, level=logging.INFO, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+    # Records are queued and written by a QueueListener thread, so a slow disk
+    # never stalls the caller. Returns the listener; stop() it on exit.
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes,
+                                                        backupCount=backup_count, encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter())
+    file_handler.setLevel(level)
+
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.setLevel(level)
+    logger.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(records, file_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+def parse_level(name, default=logging.INFO):
+    level = logging.getLevelName(str(name).upper())
+    return level if isinstance(level, int) else default
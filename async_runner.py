@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+class AsyncRunner:
+    # Runs an asyncio loop on a worker thread so network calls never block Tk.
+    # Results are handed back through the EventSystem queue that Tk drains.
+    # Without an event_system (headless), callbacks run on the loop thread.
+    def __init__(self, event_system):
+        self.event_system = event_system
+        self.loop = asyncio.new_event_loop()
+        if self.event_system is not None:
+            self.event_system.set_loop(self.loop)
+        self.thread = threading.Thread(target=self.run_loop, name="asyncio-loop", daemon=True)
+        self.thread.start()
+
+    def run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro, callback=None):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        if callback is not None:
+            event_type = f"call:{getattr(callback, '__name__', 'call')}"
+            future.add_done_callback(lambda f: self.post(self.deliver, callback, f, event_type=event_type))
+        return future
+
+    def post(self, callback, *args, event_type=None):
+        # Safe to call from any thread; callback runs on the Tk thread
+        if self.event_system is None:
+            self.loop.call_soon_threadsafe(callback, *args)
+        else:
+            self.event_system.post_call(callback, *args, event_type=event_type)
+
+    def call(self, callback, *args):
+        # Safe to call from any thread; callback runs on the loop thread
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def deliver(self, callback, future):
+        if not future.cancelled():
+            callback(future.result())
+
+    def stop(self, timeout=2):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
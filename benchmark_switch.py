@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import random
+import time
+from decoder_manager import DecoderManager
+from mwapi_simulator import SimulatedDecoder, SimulatorThread
+
+# Measures source switching against simulated decoders on loopback, so it runs
+# offline and needs no hardware. For each decoder count it logs in once, then
+# runs rounds that switch every decoder at once (as a preset recall does),
+# and reports switch latency, logins per switch and throughput.
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+async def timed_switch(manager, decoder, source, latencies):
+    started = time.perf_counter()
+    result = await manager.change_source(decoder, source)
+    if result.ok:
+        latencies.append(time.perf_counter() - started)
+    return result.ok
+
+async def run_rounds(decoders, sources, rounds, args):
+    manager = DecoderManager(connect_timeout=args.connect_timeout, read_timeout=args.read_timeout)
+    rng = random.Random(args.seed)
+    latencies = []
+    failures = 0
+    try:
+        await manager.login_all(decoders)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            results = await asyncio.gather(*(timed_switch(manager, decoder, rng.choice(sources), latencies)
+                                             for decoder in decoders))
+            failures += results.count(False)
+        elapsed = time.perf_counter() - started
+    finally:
+        await manager.close()
+    return latencies, failures, elapsed
+
+def benchmark(count, args):
+    simulated = [SimulatedDecoder(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+                                  session_ttl=args.session_ttl, seed=args.seed + i)
+                 for i in range(count)]
+    simulator = SimulatorThread(simulated)
+    addresses = simulator.start()
+    try:
+        decoders = [{'ip': address, 'username': 'Admin', 'password': 'Admin'} for address in addresses]
+        rounds = max(1, args.switches // count)
+        latencies, failures, elapsed = asyncio.run(run_rounds(decoders, simulated[0].sources, rounds, args))
+    finally:
+        simulator.stop()
+
+    switches = rounds * count
+    # The first login per decoder happens before timing starts
+    logins = sum(decoder.counts.get('login', 0) for decoder in simulated) - count
+    return {
+        'decoders': count,
+        'switches': switches,
+        'failed': failures,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'logins_per_switch': logins / switches,
+        'switches_per_s': switches / elapsed if elapsed else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark switch latency against simulated decoders")
+    parser.add_argument("--decoders", default="1,2,4,8,16", help="Comma-separated decoder counts to run")
+    parser.add_argument("--switches", type=int, default=400, help="Switches per decoder count")
+    parser.add_argument("--latency", type=float, default=0.01, help="Simulated decoder latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.002, help="Random +/- seconds on top of the latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of simulated requests that fail (0-1)")
+    parser.add_argument("--session-ttl", type=float, default=0, help="Seconds a simulated login stays valid (0 = forever)")
+    parser.add_argument("--connect-timeout", type=float, default=2)
+    parser.add_argument("--read-timeout", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    columns = ['decoders', 'switches', 'failed', 'p50_ms', 'p99_ms', 'logins_per_switch', 'switches_per_s']
+    print("  ".join(f"{column:>17}" for column in columns))
+    for count in [int(value) for value in args.decoders.split(',') if value.strip()]:
+        row = benchmark(count, args)
+        print("  ".join(f"{row[column]:>17.3f}" if isinstance(row[column], float) else f"{row[column]:>17}"
+                        for column in columns))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import argparse
+import os
+import select
+import sys
+import threading
+import serial
+from tv_control import BRAND_REPLIES, SerialTransport
+
+# Exercises SerialTransport against pty pairs, so it runs without a TV or a
+# USB adapter (POSIX only; Windows has no os.openpty). The transport opens the
+# slave end of a pty, and the master end plays the TV. Covers the flush on
+# send, keeping the port open between commands, the retry after a write to a
+# pulled cable, giving up after one retry, reconnecting once the adapter is
+# back, and reading acknowledgements in request().
+
+class PtyPort:
+    # One pty pair standing in for a USB serial adapter. unplug() closes the
+    # master end, after which writes on the slave fail with EIO and the slave
+    # device disappears, as when the cable is pulled.
+    def __init__(self):
+        self.master, slave = os.openpty()
+        self.name = os.ttyname(slave)
+        os.close(slave)
+
+    def pending(self, timeout=0):
+        # Bytes the transport has written, waiting at most timeout seconds
+        data = b''
+        while select.select([self.master], [], [], timeout)[0]:
+            data += os.read(self.master, 1024)
+            timeout = 0
+        return data
+
+    def reply(self, data):
+        os.write(self.master, data)
+
+    def unplug(self):
+        os.close(self.master)
+
+class RecordingSerial(serial.Serial):
+    # Notes writes and flushes; a pty passes bytes on at once, so whether the
+    # transport flushed cannot be seen from the master end alone
+    def __init__(self, *args, **kwargs):
+        self.calls = []
+        super().__init__(*args, **kwargs)
+
+    def write(self, data):
+        self.calls.append('write')
+        return super().write(data)
+
+    def flush(self):
+        self.calls.append('flush')
+        super().flush()
+
+class Adapter:
+    # serial_factory for the transport. The port name stays the same (like
+    # COM3) while the pty behind it changes, as when an adapter re-enumerates.
+    def __init__(self):
+        self.pty = PtyPort()
+        self.opens = 0
+
+    def __call__(self, port, baud_rate, **kwargs):
+        self.opens += 1
+        if self.pty is None:
+            raise serial.SerialException(f"could not open port {port}: no adapter")
+        return RecordingSerial(self.pty.name, baud_rate, **kwargs)
+
+    def unplug(self):
+        self.pty.unplug()
+        self.pty = None
+
+    def plug_in(self):
+        self.pty = PtyPort()
+
+class CheckFailed(Exception):
+    pass
+
+def expect(condition, message):
+    if not condition:
+        raise CheckFailed(message)
+
+def check_flush(adapter, transport):
+    transport.send(b'ka 01 01\r')
+    # send() flushes, so the bytes are already on the other end when it returns
+    data = adapter.pty.pending()
+    expect(data == b'ka 01 01\r', f"expected the command on the pty at once, got {data!r}")
+    transport.send(b'ka 01 00\r')
+    expect(adapter.pty.pending() == b'ka 01 00\r', "second command did not arrive")
+    expect(adapter.opens == 1, f"port opened {adapter.opens} times for two commands, expected once")
+    calls = transport.ser.calls
+    expect(calls == ['write', 'flush'] * 2, f"expected each write to be flushed, got {calls}")
+
+def check_retry_once(adapter, transport):
+    transport.send(b'ping\r')
+    adapter.pty.pending()
+    opens = adapter.opens
+    adapter.unplug()
+    adapter.plug_in()
+    # The write on the old port fails; the retry opens the new one
+    transport.send(b'ka 01 01\r')
+    data = adapter.pty.pending(timeout=1)
+    expect(data == b'ka 01 01\r', f"retry did not reach the new port, got {data!r}")
+    expect(adapter.opens == opens + 1, f"expected one reopen, got {adapter.opens - opens}")
+
+def check_gives_up(adapter, transport):
+    transport.send(b'ping\r')
+    adapter.pty.pending()
+    opens = adapter.opens
+    adapter.unplug()
+    try:
+        transport.send(b'ka 01 01\r')
+    except serial.SerialException:
+        pass
+    else:
+        raise CheckFailed("send to an unplugged adapter did not raise")
+    expect(adapter.opens == opens + 1, f"expected one retry, got {adapter.opens - opens}")
+    expect(transport.ser is None, "port left open after giving up")
+
+def check_reconnect(adapter, transport):
+    adapter.unplug()
+    try:
+        transport.send(b'ka 01 01\r')
+    except serial.SerialException:
+        pass
+    adapter.plug_in()
+    transport.send(b'ka 01 00\r')
+    data = adapter.pty.pending(timeout=1)
+    expect(data == b'ka 01 00\r', f"command after reconnecting did not arrive, got {data!r}")
+
+def check_request(adapter, transport):
+    ack, nak = BRAND_REPLIES['lg']
+    transport.send(b'ping\r')
+    adapter.pty.pending()
+    adapter.pty.reply(b'a 01 OK01x')  # Late reply to an earlier command; must be dropped
+    expect(transport.request(b'ka 01 01\r', ack, nak, timeout=0.2) is None,
+           "stale reply was taken as an acknowledgement")
+    adapter.pty.pending()
+
+    def answer(data):
+        adapter.pty.pending(timeout=1)
+        adapter.pty.reply(data)
+
+    for data, result in ((b'a 01 OK01x', True), (b'a 01 NG01x', False)):
+        responder = threading.Thread(target=answer, args=(data,))
+        responder.start()
+        got = transport.request(b'ka 01 01\r', ack, nak, timeout=1)
+        responder.join()
+        expect(got is result, f"reply {data!r} gave {got!r}, expected {result!r}")
+
+    adapter.unplug()
+    try:
+        transport.request(b'ka 01 01\r', ack, nak, timeout=0.2)
+    except serial.SerialException:
+        pass
+    else:
+        raise CheckFailed("request to an unplugged adapter did not raise")
+    expect(transport.ser is None, "port left open after a failed request")
+
+CHECKS = [check_flush, check_retry_once, check_gives_up, check_reconnect, check_request]
+
+def main():
+    parser = argparse.ArgumentParser(description="Check SerialTransport against pty pairs")
+    parser.add_argument("--baud-rate", type=int, default=9600)
+    args = parser.parse_args()
+    if not hasattr(os, 'openpty'):
+        parser.error("needs os.openpty(), which this platform does not have")
+
+    failed = 0
+    for check in CHECKS:
+        adapter = Adapter()
+        transport = SerialTransport('COM3', args.baud_rate, timeout=1, serial_factory=adapter)
+        try:
+            check(adapter, transport)
+            print(f"ok    {check.__name__}")
+        except (CheckFailed, serial.SerialException) as e:
+            failed += 1
+            print(f"FAIL  {check.__name__}: {e}")
+        finally:
+            transport.close()
+            if adapter.pty is not None:
+                adapter.unplug()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
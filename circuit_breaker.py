@@ -0,0 +1,47 @@
+# After this many unanswered requests in a row a decoder is treated as down:
+# requests fail at once while a background probe checks it, first after
+# BREAKER_RESET seconds and then less often, up to BREAKER_MAX_RESET
+DEFAULT_BREAKER_THRESHOLD = 3
+DEFAULT_BREAKER_RESET = 5
+BREAKER_MAX_RESET = 60
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+class CircuitBreaker:
+    # Counts consecutive unanswered requests to one decoder. on_change(state)
+    # is called on the asyncio loop whenever the state changes.
+    def __init__(self, threshold=DEFAULT_BREAKER_THRESHOLD, reset_timeout=DEFAULT_BREAKER_RESET, on_change=None):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.retry_after = reset_timeout
+        self.on_change = on_change
+        self.state = CLOSED
+        self.failures = 0
+
+    def allow(self):
+        return self.state == CLOSED
+
+    def record_success(self):
+        self.failures = 0
+        self.retry_after = self.reset_timeout
+        self.set_state(CLOSED)
+
+    def record_failure(self):
+        # Returns True when this failure opened the breaker
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self.retry_after = min(self.retry_after * 2, BREAKER_MAX_RESET)
+            self.set_state(OPEN)
+        elif self.state == CLOSED and self.failures >= self.threshold:
+            self.set_state(OPEN)
+            return True
+        return False
+
+    def set_state(self, state):
+        if state != self.state:
+            self.state = state
+            if self.on_change is not None:
+                self.on_change(state)
@@ -1,16 +1,119 @@
+import atexit
 import configparser
+import io
+import os
+import tempfile
+import threading
+import time
+from metrics import metrics
+
+# Seconds to wait for more changes before writing; a burst of taps or admin
+# edits ends up as one write
+DEFAULT_SAVE_DELAY = 1.0
+# Changes that never go quiet are still written this many seconds after the first
+MAX_SAVE_DELAY = 5.0
 
 class ConfigManager:
-    def __init__(self, config_file):
+    # Write-behind store for config.ini. Changes go through set()/add_section()/
+    # remove_section() under a lock, are tracked as dirty keys, and are written
+    # by a timer thread once things go quiet. Writes land in a temp file that
+    # replaces config.ini, so an interrupted write never leaves it half-written.
+    def __init__(self, config_file, save_delay=DEFAULT_SAVE_DELAY):
         self.config_file = config_file
         self.config = configparser.ConfigParser()
+        self.save_delay = save_delay
+        self.lock = threading.RLock()
+        self.write_lock = threading.Lock()
+        self.dirty = set()
+        self.save_timer = None
+        self.first_dirty = None
         self.load_config()
+        atexit.register(self.flush)
 
     def load_config(self):
-        self.config.read(self.config_file)
+        # Pending changes are written first so the re-read cannot undo them
+        self.flush()
+        with self.lock:
+            self.config.read(self.config_file)
+
+    def set(self, section, key, value):
+        with self.lock:
+            if not self.config.has_section(section):
+                self.config.add_section(section)
+            elif self.config.get(section, key, fallback=None) == value:
+                return
+            self.config.set(section, key, value)
+            self.mark_dirty(section, key)
+
+    def add_section(self, section, values=None):
+        with self.lock:
+            if not self.config.has_section(section):
+                self.config.add_section(section)
+                self.mark_dirty(section)
+            for key, value in (values or {}).items():
+                self.set(section, key, value)
+
+    def remove_option(self, section, key):
+        with self.lock:
+            if self.config.has_section(section) and self.config.remove_option(section, key):
+                self.mark_dirty(section, key)
+
+    def remove_section(self, section):
+        with self.lock:
+            if self.config.remove_section(section):
+                self.mark_dirty(section)
+
+    def mark_dirty(self, section, key=None):
+        # Each change restarts the save timer, up to MAX_SAVE_DELAY after the
+        # first unsaved change
+        metrics.inc('config_changes_total')
+        with self.lock:
+            self.dirty.add((section, key))
+            now = time.monotonic()
+            if self.first_dirty is None:
+                self.first_dirty = now
+            if self.save_timer is not None:
+                self.save_timer.cancel()
+            delay = min(self.save_delay, max(0, self.first_dirty + MAX_SAVE_DELAY - now))
+            self.save_timer = threading.Timer(delay, self.flush)
+            self.save_timer.daemon = True
+            self.save_timer.start()
 
     def save_config(self):
-        with open(self.config_file, 'w') as configfile:
-            self.config.write(configfile)
+        # Kept for callers that edit self.config directly; schedules a write
+        self.mark_dirty(None)
+
+    def flush(self):
+        # Writes pending changes now. Safe to call from any thread; the
+        # write lock keeps an older snapshot from landing after a newer one.
+        with self.write_lock:
+            with self.lock:
+                if self.save_timer is not None:
+                    self.save_timer.cancel()
+                    self.save_timer = None
+                self.first_dirty = None
+                if not self.dirty:
+                    return
+                buffer = io.StringIO()
+                self.config.write(buffer)
+                self.dirty.clear()
+            with metrics.span('config_write'):
+                self.write_atomic(buffer.getvalue())
 
-    # Add other methods as needed
\ No newline at end of file
+    def write_atomic(self, text):
+        directory = os.path.dirname(os.path.abspath(self.config_file))
+        fd, tmp_path = tempfile.mkstemp(prefix='.config-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                tmp_file.write(text)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, self.config_file)
+        except Exception as e:
+            print(f"Error saving {self.config_file}: {e}")
+            with self.lock:
+                self.dirty.add((None, None))  # Retried with the next change
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
@@ -0,0 +1,130 @@
+from dataclasses import dataclass, field
+
+DEFAULT_WELCOME = 'Welcome to NDI Decoder Control!'
+
+@dataclass(frozen=True)
+class Source:
+    slot: str  # sourceN key shared by [NDI_Sources] and [User_Friendly_Names]
+    ndi_name: str
+    name: str
+    tags: tuple = ()  # From [Source_Tags], e.g. source3 = Studio A, Cameras
+
+@dataclass(frozen=True)
+class Decoder:
+    section: str
+    ip: str
+    username: str
+    password: str
+    name: str
+    # Seconds; None uses the [Settings] defaults
+    connect_timeout: float = None
+    read_timeout: float = None
+
+    def as_dict(self):
+        return {'ip': self.ip, 'username': self.username, 'password': self.password, 'name': self.name,
+                'connect_timeout': self.connect_timeout, 'read_timeout': self.read_timeout}
+
+@dataclass(frozen=True)
+class AppConfig:
+    # Parsed view of config.ini. Reloads build a new AppConfig and diff() it
+    # against the previous one, so only what actually changed is refreshed.
+    sources: tuple = ()
+    active_source: str = ''
+    decoders: tuple = ()
+    messages: dict = field(default_factory=dict)
+    settings: dict = field(default_factory=dict)
+    presets: dict = field(default_factory=dict)
+    previews: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_parser(cls, config):
+        sources = []
+        if config.has_section('NDI_Sources'):
+            names = config['User_Friendly_Names'] if config.has_section('User_Friendly_Names') else {}
+            tags = config['Source_Tags'] if config.has_section('Source_Tags') else {}
+            for key, value in config['NDI_Sources'].items():
+                if key.startswith('source'):
+                    sources.append(Source(key, value, names.get(key, value),
+                                          tuple(tag.strip() for tag in tags.get(key, '').split(',') if tag.strip())))
+        active_source = ''
+        if config.has_section('NDI_Sources'):
+            active_source = config['NDI_Sources'].get('active_source', '')
+        if not active_source and sources:
+            active_source = sources[0].ndi_name
+
+        decoders = []
+        for section in config.sections():
+            if section.startswith('NDIDecoder'):
+                decoders.append(Decoder(section,
+                                        config[section].get('ip', ''),
+                                        config[section].get('username', ''),
+                                        config[section].get('password', ''),
+                                        config[section].get('name', f"Decoder {len(decoders) + 1}"),
+                                        parse_seconds(config, section, 'connect_timeout'),
+                                        parse_seconds(config, section, 'read_timeout')))
+
+        return cls(tuple(sources), active_source, tuple(decoders),
+                   dict(config['Messages']) if config.has_section('Messages') else {},
+                   dict(config['Settings']) if config.has_section('Settings') else {},
+                   parse_presets(config),
+                   dict(config['Previews']) if config.has_section('Previews') else {})
+
+    def diff(self, other):
+        # Returns (event_type, payload) pairs describing how other differs
+        changes = []
+        if self.sources != other.sources:
+            changes.append(('sources_changed', other.sources))
+        if self.active_source != other.active_source:
+            changes.append(('active_source_changed', other.active_source))
+        if self.decoders != other.decoders:
+            count = max(len(self.decoders), len(other.decoders))
+            changed = [i for i in range(count)
+                       if i >= len(self.decoders) or i >= len(other.decoders) or self.decoders[i] != other.decoders[i]]
+            changes.append(('decoders_changed', changed))
+        changed_messages = changed_keys(self.messages, other.messages)
+        if changed_messages:
+            changes.append(('messages_changed', changed_messages))
+        changed_settings = changed_keys(self.settings, other.settings)
+        if changed_settings:
+            changes.append(('settings_changed', changed_settings))
+        if self.presets != other.presets:
+            changes.append(('presets_changed', other.presets))
+        if self.previews != other.previews:
+            changes.append(('previews_changed', other.previews))
+        return changes
+
+    def message(self, key, default):
+        return self.messages.get(key, default)
+
+def parse_seconds(config, section, key):
+    value = config[section].get(key, '').strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Ignoring {key} = {value} in [{section}]: expected seconds")
+        return None
+
+def changed_keys(old, new):
+    return sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
+def parse_presets(config):
+    # [Preset: <name>] sections map NDIDecoderN keys to NDI source names
+    presets = {}
+    for section in config.sections():
+        if not section.startswith('Preset:'):
+            continue
+        routes = {}
+        for key, source in config[section].items():
+            try:
+                if not key.startswith('ndidecoder'):
+                    raise ValueError(key)
+                decoder_index = int(key[len('ndidecoder'):]) - 1
+            except ValueError:
+                print(f"Ignoring '{key}' in [{section}]: expected NDIDecoderN = source")
+                continue
+            if source:
+                routes[decoder_index] = source
+        presets[section[len('Preset:'):].strip()] = routes
+    return presets
@@ -0,0 +1,216 @@
+import argparse
+import asyncio
+import hmac
+import signal
+from aiohttp import web
+from decoder_core import DEFAULT_SWITCH_BURST, DEFAULT_SWITCH_RATE, NO_SUCH_DECODER, RATE_LIMITED, SUPERSEDED, DecoderCore
+from source_registry import SourceRegistry
+from switch_journal import SwitchJournal, journal_path, parse_time
+
+DEFAULT_API_HOST = '127.0.0.1'
+# Events queued for one WebSocket client before it is treated as stalled and
+# sent a fresh snapshot instead
+CLIENT_QUEUE_SIZE = 100
+
+class ControlAPI:
+    # HTTP + WebSocket front end for a DecoderCore, served from the core's
+    # asyncio loop:
+    #   GET  /api/state                      decoders, sources (with tags) and presets
+    #   POST /api/decoders/{index}/source    {"source": "<NDI name>"}; add ?wait=0 to get
+    #                                        a 429 instead of waiting for the decoder's rate limit
+    #   POST /api/presets/{name}
+    #   GET  /api/ws                         state on connect, then every change
+    #   GET  /api/journal/at?decoder=<name>&time=<epoch or ISO time>
+    #   GET  /api/journal/usage[?since=&until=&decoder=]
+    # If token is set, requests must send "Authorization: Bearer <token>"
+    # (or ?token=<token>, for browser WebSockets).
+    def __init__(self, core, token=None):
+        self.core = core
+        self.token = token
+        self.runner = None
+
+    def make_app(self):
+        app = web.Application(middlewares=[self.check_token])
+        app.router.add_get('/api/state', self.get_state)
+        app.router.add_post('/api/decoders/{index}/source', self.post_source)
+        app.router.add_post('/api/presets/{name}', self.post_preset)
+        app.router.add_get('/api/ws', self.websocket)
+        app.router.add_get('/api/journal/at', self.get_source_at)
+        app.router.add_get('/api/journal/usage', self.get_usage)
+        return app
+
+    async def start(self, host=DEFAULT_API_HOST, port=8080):
+        self.runner = web.AppRunner(self.make_app(), access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        return self.runner.addresses[0]
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    @web.middleware
+    async def check_token(self, request, handler):
+        if self.token:
+            header = request.headers.get('Authorization', '')
+            supplied = header[len('Bearer '):] if header.startswith('Bearer ') else request.query.get('token', '')
+            if not hmac.compare_digest(supplied.encode(), self.token.encode()):
+                return web.json_response({'error': 'unauthorized'}, status=401)
+        return await handler(request)
+
+    async def get_state(self, request):
+        return web.json_response(self.core.snapshot())
+
+    async def post_source(self, request):
+        try:
+            index = int(request.match_info['index'])
+            source = (await request.json())['source']
+        except (ValueError, KeyError, TypeError):
+            return web.json_response({'error': 'expected {"source": "<NDI name>"}'}, status=400)
+        if source not in self.core.registry:
+            return web.json_response({'error': f"unknown source: {source}"}, status=400)
+        wait = request.query.get('wait', '1') not in ('0', 'false', 'no')
+        result = await self.core.switch(index, source, origin=f"api:{request.remote}", wait=wait)
+        return self.switch_response(result)
+
+    async def post_preset(self, request):
+        name = request.match_info['name']
+        if name not in self.core.presets:
+            return web.json_response({'error': f"unknown preset: {name}"}, status=404)
+        results = await self.core.recall_preset(name, origin=f"api:{request.remote}")
+        return web.json_response({'results': [{'decoder': index, 'source': source, 'ok': result.ok,
+                                               'error': result.error}
+                                              for index, source, result in results]})
+
+    def switch_response(self, result):
+        if result.ok:
+            return web.json_response({'ok': True})
+        if result.error == NO_SUCH_DECODER:
+            status = 404
+        elif result.error == RATE_LIMITED:
+            status = 429
+        elif result.error == SUPERSEDED:
+            status = 409  # Another switch to this decoder arrived before this one was sent
+        else:
+            status = 502  # The decoder refused or did not answer
+        error = result.error or f"decoder returned status {result.status_code}: {result.text}"
+        return web.json_response({'ok': False, 'error': error}, status=status)
+
+    async def get_source_at(self, request):
+        if self.core.journal is None:
+            return web.json_response({'error': 'the switch journal is off'}, status=404)
+        try:
+            decoder = request.query['decoder']
+            when = parse_time(request.query['time'])
+        except (KeyError, ValueError):
+            return web.json_response({'error': 'expected ?decoder=<name>&time=<time>'}, status=400)
+        row = await asyncio.get_running_loop().run_in_executor(None, self.core.journal.source_at, decoder, when)
+        if row is None:
+            return web.json_response({'decoder': decoder, 'source': None})
+        ts, source, origin = row
+        return web.json_response({'decoder': decoder, 'source': source, 'switched_at': ts, 'origin': origin})
+
+    async def get_usage(self, request):
+        if self.core.journal is None:
+            return web.json_response({'error': 'the switch journal is off'}, status=404)
+        try:
+            since, until = (parse_time(request.query[key]) if key in request.query else None
+                            for key in ('since', 'until'))
+        except ValueError:
+            return web.json_response({'error': 'since and until must be times'}, status=400)
+        counts = await asyncio.get_running_loop().run_in_executor(
+            None, self.core.journal.usage_counts, since, until, request.query.get('decoder'))
+        return web.json_response({'usage': [{'source': source, 'switches': count} for source, count in counts]})
+
+    async def websocket(self, request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        events = asyncio.Queue(CLIENT_QUEUE_SIZE)
+
+        def push(event):
+            try:
+                events.put_nowait(event)
+            except asyncio.QueueFull:
+                # Stalled client: drop its backlog and let it catch up in one go
+                while not events.empty():
+                    events.get_nowait()
+                events.put_nowait(dict(self.core.snapshot(), type='state'))
+
+        self.core.subscribe(push)
+        sender = asyncio.create_task(self.send_events(ws, events))
+        try:
+            await ws.send_json(dict(self.core.snapshot(), type='state'))
+            async for _ in ws:
+                pass  # Commands go through the HTTP routes; this only waits for close
+        finally:
+            self.core.unsubscribe(push)
+            sender.cancel()
+        return ws
+
+    async def send_events(self, ws, events):
+        while True:
+            event = await events.get()
+            await ws.send_json(event)
+
+def main():
+    # Headless mode: the core, poller and API without the Tk kiosk
+    from async_runner import AsyncRunner
+    from config_manager import ConfigManager
+    from config_model import AppConfig
+    from decoder_manager import DecoderManager
+    from decoder_poller import DecoderPoller
+    from source_discovery import SourceDiscovery
+
+    parser = argparse.ArgumentParser(description="Serve the decoder control API without the kiosk UI")
+    parser.add_argument("--config", default='config.ini')
+    parser.add_argument("--host", help="Address to bind (default [Settings] api_host or 127.0.0.1)")
+    parser.add_argument("--port", type=int, help="Port (default [Settings] api_port or 8080)")
+    args = parser.parse_args()
+
+    config_manager = ConfigManager(args.config)
+    model = AppConfig.from_parser(config_manager.config)
+    settings = model.settings
+    runner = AsyncRunner(None)
+    core = make_core(DecoderManager(config_manager), settings)
+    core.decoder_manager.on_breaker_change = core.set_breaker
+    path = journal_path(settings, args.config)
+    if path:
+        core.journal = core.decoder_manager.journal = SwitchJournal(path)
+    decoders = [decoder.as_dict() for decoder in model.decoders]
+    runner.call(core.configure, decoders, SourceRegistry(model.sources), model.presets)
+    poller = DecoderPoller(core.decoder_manager, runner,
+                           lambda index, online, channel: core.update_state(index, online=online, channel=channel))
+    poller.start(decoders)
+    discovery = SourceDiscovery(core.decoder_manager, runner,
+                                lambda index, names: core.update_state(index, sources=visible_sources(names)))
+    discovery.start(decoders)
+
+    api = ControlAPI(core, settings.get('api_token') or None)
+    host = args.host or settings.get('api_host') or DEFAULT_API_HOST
+    port = args.port or int(settings.get('api_port') or 8080)
+    address = runner.submit(api.start(host, port)).result()
+    print(f"Control API listening on http://{address[0]}:{address[1]}")
+
+    stopped = asyncio.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: runner.call(stopped.set))
+    signal.signal(signal.SIGTERM, lambda signum, frame: runner.call(stopped.set))
+    runner.submit(stopped.wait()).result()
+    poller.stop().result()
+    discovery.stop().result()
+    runner.submit(api.stop()).result()
+    runner.submit(core.decoder_manager.close()).result()
+    runner.stop()
+    if core.journal is not None:
+        core.journal.close()
+
+def visible_sources(names):
+    return sorted(names) if names is not None else None
+
+def make_core(decoder_manager, settings):
+    return DecoderCore(decoder_manager,
+                       switch_rate=float(settings.get('switch_rate', DEFAULT_SWITCH_RATE)),
+                       switch_burst=int(settings.get('switch_burst', DEFAULT_SWITCH_BURST)))
+
+if __name__ == "__main__":
+    main()
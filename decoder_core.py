@@ -0,0 +1,222 @@
+import asyncio
+import time
+from decoder_manager import MwapiResult
+from metrics import metrics
+from source_registry import SourceRegistry
+
+# Switches sent to each decoder per second, with bursts of up to
+# DEFAULT_SWITCH_BURST, no matter how many panels are driving it. Switches
+# beyond that wait their turn (and collapse into the latest) unless the caller
+# asked not to wait.
+DEFAULT_SWITCH_RATE = 2.0
+DEFAULT_SWITCH_BURST = 4
+
+RATE_LIMITED = "Too many switches for this decoder; try again shortly"
+NO_SUCH_DECODER = "No such decoder"
+SUPERSEDED = "Superseded by a later switch on this decoder"
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        # Seconds until a token is free
+        self.refill()
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class SwitchLane:
+    # One decoder's switches: at most one set-channel on the wire, and taps
+    # that arrive meanwhile collapse into a single pending target
+    def __init__(self):
+        self.pending = None  # (index, decoder, source, origin, future)
+        self.worker = None
+
+class DecoderCore:
+    # Decoder, source and preset operations without any UI, shared by the
+    # kiosk and the control API. It lives on the asyncio loop: call it there
+    # (AsyncRunner.submit / loop.call_soon_threadsafe), and subscribers are
+    # called there too, with an event dict for every change:
+    #   {'type': 'state', ...snapshot()}           after configure()
+    #   {'type': 'decoder', 'decoder': {...}}      health, channel or sources changed
+    #   {'type': 'switched', 'decoder': index, 'source': name, 'origin': who}
+    # Switches to one decoder are sent one at a time, latest tap wins: a
+    # switch still waiting its turn (for the one on the wire or for the rate
+    # limit) when another arrives returns SUPERSEDED.
+    def __init__(self, decoder_manager, switch_rate=DEFAULT_SWITCH_RATE, switch_burst=DEFAULT_SWITCH_BURST):
+        self.decoder_manager = decoder_manager
+        self.switch_rate = switch_rate
+        self.switch_burst = switch_burst
+        self.decoders = []
+        self.registry = SourceRegistry()
+        self.presets = {}
+        self.states = {}  # decoder index -> {'online', 'channel', 'breaker', 'sources'}
+        self.limiters = {}  # decoder IP -> TokenBucket
+        self.lanes = {}  # decoder IP -> SwitchLane
+        self.subscribers = []
+        self.journal = None  # SwitchJournal; every switch attempt is recorded
+
+    def configure(self, decoders, registry, presets):
+        # Replaces the lists from config.ini; edited decoders lose their state
+        for index in list(self.states):
+            if index >= len(decoders) or index >= len(self.decoders) or decoders[index] != self.decoders[index]:
+                del self.states[index]
+        self.decoders = [dict(decoder) for decoder in decoders]
+        self.registry = registry
+        self.presets = dict(presets)
+        ips = {decoder['ip'] for decoder in self.decoders}
+        self.limiters = {ip: bucket for ip, bucket in self.limiters.items() if ip in ips}
+        self.lanes = {ip: lane for ip, lane in self.lanes.items() if ip in ips or lane.worker is not None}
+        self.publish(dict(self.snapshot(), type='state'))
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def publish(self, event):
+        for callback in list(self.subscribers):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Error delivering {event.get('type')} event: {e}")
+
+    def decoder_view(self, index):
+        # What clients may see of a decoder; credentials stay here
+        decoder = self.decoders[index]
+        state = self.states.get(index, {})
+        return {
+            'index': index,
+            'name': decoder.get('name', f"Decoder {index + 1}"),
+            'configured': bool(decoder['ip']),
+            'online': state.get('online'),
+            'channel': state.get('channel'),
+            'breaker': state.get('breaker', 'closed'),
+            'sources': state.get('sources'),
+        }
+
+    def snapshot(self):
+        return {
+            'decoders': [self.decoder_view(index) for index in range(len(self.decoders))],
+            'sources': self.registry.as_list(),
+            'presets': sorted(self.presets),
+        }
+
+    def update_state(self, index, **fields):
+        # Merges health, channel, breaker or visible sources reported for a
+        # decoder and publishes the decoder if anything changed
+        if not 0 <= index < len(self.decoders):
+            return
+        state = self.states.setdefault(index, {})
+        changed = {key: value for key, value in fields.items() if state.get(key) != value}
+        if changed:
+            state.update(changed)
+            self.publish({'type': 'decoder', 'decoder': self.decoder_view(index)})
+
+    def set_breaker(self, ip, breaker):
+        for index, decoder in enumerate(self.decoders):
+            if decoder['ip'] == ip:
+                self.update_state(index, breaker=breaker)
+
+    def limiter(self, ip):
+        limiter = self.limiters.get(ip)
+        if limiter is None:
+            limiter = self.limiters[ip] = TokenBucket(self.switch_rate, self.switch_burst)
+        return limiter
+
+    async def switch(self, index, source, origin='kiosk', wait=True):
+        # With wait=False a switch that would have to wait for the rate limit
+        # returns RATE_LIMITED at once and leaves any pending switch alone
+        if not 0 <= index < len(self.decoders):
+            return MwapiResult(False, error=NO_SUCH_DECODER)
+        decoder = self.decoders[index]
+        if not wait and decoder['ip'] and self.limiter(decoder['ip']).delay() > 0:
+            metrics.inc('decoder_rate_limited_total', decoder=decoder['ip'])
+            return MwapiResult(False, error=RATE_LIMITED)
+        lane = self.lanes.get(decoder['ip'])
+        if lane is None:
+            lane = self.lanes[decoder['ip']] = SwitchLane()
+        if lane.pending is not None:
+            # Not sent yet, so it is dropped rather than cancelled on the wire
+            _, _, old_source, old_origin, old_future = lane.pending
+            superseded = MwapiResult(False, error=SUPERSEDED)
+            if not old_future.done():
+                old_future.set_result(superseded)
+            metrics.inc('decoder_switches_superseded_total', decoder=decoder['ip'])
+            if self.journal is not None:
+                self.journal.record('switch', decoder, old_source, superseded, 0, old_origin)
+        future = asyncio.get_running_loop().create_future()
+        lane.pending = (index, decoder, source, origin, future)
+        if lane.worker is None:
+            lane.worker = asyncio.create_task(self.drain(lane))
+        return await future
+
+    async def drain(self, lane):
+        # A request already on the wire is left to finish: aborting it would
+        # drop the keep-alive connection and leave the decoder's channel unknown
+        future = None
+        try:
+            while lane.pending is not None:
+                ip = lane.pending[1]['ip']
+                delay = self.limiter(ip).delay() if ip else 0
+                if delay > 0:
+                    # Taps that arrive while waiting for a token replace the
+                    # pending target, so only the latest goes out
+                    metrics.inc('decoder_switch_waits_total', decoder=ip)
+                    await asyncio.sleep(delay)
+                    continue
+                index, decoder, source, origin, future = lane.pending
+                lane.pending = None
+                if future.done():
+                    continue  # The caller gave up while waiting
+                result = await self.send_switch(index, decoder, source, origin)
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            # Work is only left over if the loop is shutting down
+            lane.worker = None
+            if future is not None and not future.done():
+                future.cancel()
+            if lane.pending is not None:
+                lane.pending[-1].cancel()
+                lane.pending = None
+
+    async def send_switch(self, index, decoder, source, origin):
+        started = time.perf_counter()
+        result = await self.set_channel(decoder, source)
+        if self.journal is not None:
+            self.journal.record('switch', decoder, source, result, time.perf_counter() - started, origin)
+        # The list may have been replaced while the request was in flight
+        if result.ok and index < len(self.decoders) and self.decoders[index] == decoder:
+            self.update_state(index, channel=source)
+            self.publish({'type': 'switched', 'decoder': index, 'source': source, 'origin': origin})
+        return result
+
+    async def set_channel(self, decoder, source):
+        if not decoder['ip']:
+            return MwapiResult(False, error="No decoder IP set")
+        self.limiter(decoder['ip']).take()  # drain() waited until one was free
+        return await self.decoder_manager.change_source(dict(decoder), source)
+
+    async def recall_preset(self, name, origin='kiosk'):
+        # Switches every decoder in the preset at once and returns
+        # [(decoder index, source, result)]
+        routes = sorted(self.presets.get(name, {}).items())
+        results = await asyncio.gather(*(self.switch(index, source, origin) for index, source in routes))
+        return [(index, source, result) for (index, source), result in zip(routes, results)]
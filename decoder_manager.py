@@ -1,23 +1,378 @@
 import aiohttp
 import asyncio
+import hashlib
+import json
+import random
+import time
+from circuit_breaker import CLOSED, DEFAULT_BREAKER_RESET, DEFAULT_BREAKER_THRESHOLD, HALF_OPEN, OPEN, CircuitBreaker
+from metrics import metrics
+
+# Seconds; a decoder that is rebooting or unplugged should fail fast instead of
+# hanging until the TCP stack gives up
+DEFAULT_CONNECT_TIMEOUT = 2
+DEFAULT_READ_TIMEOUT = 5
+# Keep-alive connections kept open per decoder, so a salvo or a switch right
+# after selecting a decoder does not pay a TCP handshake
+CONNECTIONS_PER_DECODER = 2
+# HTTP statuses that always mean the sid is no longer accepted
+SESSION_EXPIRED_HTTP_STATUSES = (401, 403)
+# mwapi status for "not logged in"; [Settings] relogin_statuses adds more
+MWAPI_NOT_LOGGED_IN = 37
+# Requests that get no answer at all are retried with jittered exponential
+# backoff, as long as another attempt still fits in the retry budget (seconds)
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_RETRY_BUDGET = 4
+RETRY_BACKOFF = 0.1
+MAX_RETRY_BACKOFF = 1.0
+
+class MwapiResult:
+    def __init__(self, ok, url='', status_code=None, text='', data=None, sid=None, error=None):
+        self.ok = ok
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.data = data or {}
+        self.sid = sid
+        self.error = error
+
+def find_channel_name(data):
+    # The current NDI channel is reported either as a plain string or as an
+    # object carrying its name, under one of these keys depending on firmware
+    for key in ('channel', 'cur-channel', 'source', 'ndi-source'):
+        value = data.get(key)
+        if isinstance(value, str):
+            return value
+        if isinstance(value, dict):
+            name = value.get('ndi-name') or value.get('name')
+            if name:
+                return name
+    for value in data.values():
+        if isinstance(value, dict):
+            name = find_channel_name(value)
+            if name:
+                return name
+    return None
+
+def find_source_names(data):
+    # get-ndi-sources lists the sources a decoder can see, as names or as
+    # objects carrying the name, under one of these keys depending on firmware
+    for key in ('sources', 'ndi-sources', 'data'):
+        value = data.get(key)
+        if isinstance(value, dict):
+            value = value.get('sources')
+        if isinstance(value, list):
+            names = set()
+            for item in value:
+                if isinstance(item, str):
+                    names.add(item)
+                elif isinstance(item, dict):
+                    name = item.get('ndi-name') or item.get('name')
+                    if name:
+                        names.add(name)
+            return frozenset(names)
+    return None
+
+def request_tracing():
+    # Splits each request into DNS, TCP connect and total time per decoder and
+    # mwapi method, so a slow switch can be pinned on the network or the decoder.
+    # Requests pass trace_request_ctx={'decoder': ip} so the label matches the
+    # configured IP used by the other per-decoder metrics.
+    async def on_request_start(session, context, params):
+        context.started = time.perf_counter()
+        decoder = (context.trace_request_ctx or {}).get('decoder', params.url.host)
+        context.labels = {'decoder': decoder, 'method': params.url.query.get('method', '')}
+
+    async def on_dns_start(session, context, params):
+        context.dns_started = time.perf_counter()
+
+    async def on_dns_end(session, context, params):
+        metrics.observe('decoder_dns_seconds', time.perf_counter() - context.dns_started,
+                        decoder=context.labels['decoder'])
+
+    async def on_connect_start(session, context, params):
+        context.connect_started = time.perf_counter()
+
+    async def on_connect_end(session, context, params):
+        metrics.observe('decoder_connect_seconds', time.perf_counter() - context.connect_started,
+                        decoder=context.labels['decoder'])
+
+    async def on_request_end(session, context, params):
+        metrics.observe('decoder_request_seconds', time.perf_counter() - context.started, **context.labels)
+
+    async def on_request_exception(session, context, params):
+        metrics.inc('decoder_request_errors_total', **context.labels)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_dns_resolvehost_start.append(on_dns_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_end)
+    trace_config.on_connection_create_start.append(on_connect_start)
+    trace_config.on_connection_create_end.append(on_connect_end)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+class DecoderSession:
+    # A single decoder's sid plus its own keep-alive connection pool, retry
+    # policy and circuit breaker
+    def __init__(self, decoder, timeout, relogin_statuses, max_retries=DEFAULT_MAX_RETRIES,
+                 retry_budget=DEFAULT_RETRY_BUDGET, breaker=None):
+        self.ip = decoder['ip']
+        self.username = decoder['username']
+        self.password = decoder['password']
+        self.timeout = timeout
+        self.relogin_statuses = relogin_statuses
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget
+        self.breaker = breaker or CircuitBreaker()
+        self.url = f"http://{self.ip}/mwapi"
+        self.sid = None
+        self.session = None
+        self.probe_task = None
+        self.login_lock = asyncio.Lock()
+        self.on_login = None  # on_login(result, seconds) after every login attempt
+
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            # The sid is sent explicitly, so the cookie jar is not needed
+            connector = aiohttp.TCPConnector(limit=CONNECTIONS_PER_DECODER)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 cookie_jar=aiohttp.DummyCookieJar(),
+                                                 timeout=self.timeout,
+                                                 trace_configs=[request_tracing()])
+        return self.session
+
+    async def request(self, params):
+        if not self.breaker.allow():
+            metrics.inc('decoder_fast_failures_total', decoder=self.ip)
+            return MwapiResult(False, self.url, error="Decoder is not responding; retrying in the background")
+        deadline = time.monotonic() + self.retry_budget
+        backoff = RETRY_BACKOFF
+        result = await self.send(params)
+        for attempt in range(self.max_retries):
+            if result.status_code is not None:
+                break
+            delay = random.uniform(0, backoff)
+            remaining = deadline - time.monotonic() - delay
+            # Only retry if the next attempt has time to at least connect
+            if remaining < self.timeout.sock_connect:
+                break
+            metrics.inc('decoder_retries_total', decoder=self.ip)
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, MAX_RETRY_BACKOFF)
+            try:
+                result = await asyncio.wait_for(self.send(params), remaining)
+            except asyncio.TimeoutError:
+                result = MwapiResult(False, self.url, error="Request timed out")
+        if result.status_code is not None:
+            self.breaker.record_success()
+        elif self.breaker.record_failure():
+            self.probe_task = asyncio.create_task(self.probe())
+        return result
+
+    async def probe(self):
+        # Runs while the breaker is open. Any HTTP answer, even "not logged
+        # in", shows the decoder is reachable again.
+        while True:
+            await asyncio.sleep(self.breaker.retry_after)
+            self.breaker.set_state(HALF_OPEN)
+            result = await self.send({"method": "get-status"})
+            if result.status_code is not None:
+                self.breaker.record_success()
+                self.probe_task = None
+                return
+            self.breaker.record_failure()
+
+    async def send(self, params):
+        headers = {'Cookie': f"sid={self.sid}"} if self.sid else None
+        try:
+            async with self.get_session().get(self.url, params=params, headers=headers,
+                                              trace_request_ctx={'decoder': self.ip}) as response:
+                text = await response.text()
+                try:
+                    data = json.loads(text)
+                except ValueError:
+                    data = {}
+                ok = response.status == 200 and data.get("status") == 0
+                sid = response.cookies.get('sid')
+                return MwapiResult(ok, str(response.url), response.status, text, data,
+                                   sid=sid.value if sid else None)
+        except asyncio.TimeoutError:
+            return MwapiResult(False, self.url, error="Request timed out")
+        except aiohttp.ClientError as e:
+            return MwapiResult(False, self.url, error=str(e))
+
+    def session_expired(self, result):
+        if result.status_code in SESSION_EXPIRED_HTTP_STATUSES:
+            return True
+        if result.status_code != 200 or result.ok:
+            return False
+        # Other mwapi errors (unknown source, refused switch) are reported,
+        # not retried behind a fresh login
+        return result.data.get("status") in self.relogin_statuses
+
+    async def login(self, sid=None):
+        async with self.login_lock:
+            # Another caller may have logged in while this one waited
+            if sid is not None and self.sid is not None and self.sid != sid:
+                return MwapiResult(True, self.url, sid=self.sid)
+            md5_password = hashlib.md5(self.password.encode()).hexdigest()
+            params = {
+                "method": "login",
+                "id": self.username,
+                "pass": md5_password
+            }
+            self.sid = None
+            started = time.perf_counter()
+            with metrics.span('decoder_login', decoder=self.ip):
+                result = await self.request(params)
+            if result.ok and not result.sid:
+                result.ok = False
+                result.error = "Session ID not found in cookies"
+            if result.ok:
+                self.sid = result.sid
+            else:
+                metrics.inc('decoder_login_failures_total', decoder=self.ip)
+            if self.on_login is not None:
+                self.on_login(result, time.perf_counter() - started)
+            return result
+
+    async def ensure_login(self):
+        if self.sid is not None:
+            return MwapiResult(True, self.url, sid=self.sid)
+        return await self.login()
+
+    async def call(self, params):
+        result = await self.ensure_login()
+        if not result.ok:
+            return result
+        sid = self.sid
+        result = await self.request(params)
+        if self.session_expired(result):
+            login_result = await self.login(sid)
+            if not login_result.ok:
+                return login_result
+            result = await self.request(params)
+        return result
+
+    async def close(self):
+        if self.probe_task is not None:
+            self.probe_task.cancel()
+            self.probe_task = None
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+def session_key(decoder):
+    return (decoder['ip'], decoder['username'], decoder['password'],
+            decoder.get('connect_timeout'), decoder.get('read_timeout'))
 
 class DecoderManager:
-    def __init__(self, config_manager):
+    # on_breaker_change(ip, state), if set, is called on the asyncio loop when
+    # a decoder's circuit breaker opens, probes or closes. Logins and breaker
+    # changes are recorded in journal (a SwitchJournal) if one is set.
+    def __init__(self, config_manager=None, connect_timeout=None, read_timeout=None):
         self.config_manager = config_manager
-        self.session = aiohttp.ClientSession()
+        settings = {}
+        if config_manager is not None and config_manager.config.has_section('Settings'):
+            settings = config_manager.config['Settings']
+        if connect_timeout is None:
+            connect_timeout = float(settings.get('connect_timeout', DEFAULT_CONNECT_TIMEOUT))
+        if read_timeout is None:
+            read_timeout = float(settings.get('read_timeout', DEFAULT_READ_TIMEOUT))
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.relogin_statuses = {MWAPI_NOT_LOGGED_IN} | {int(s) for s in settings.get('relogin_statuses', '').split(',') if s.strip()}
+        self.max_retries = int(settings.get('max_retries', DEFAULT_MAX_RETRIES))
+        self.retry_budget = float(settings.get('retry_budget', DEFAULT_RETRY_BUDGET))
+        self.breaker_threshold = int(settings.get('breaker_threshold', DEFAULT_BREAKER_THRESHOLD))
+        self.breaker_reset = float(settings.get('breaker_reset', DEFAULT_BREAKER_RESET))
+        self.on_breaker_change = None
+        self.journal = None
+        # One cached session per decoder, keyed on its address, credentials and
+        # timeouts so an edit in the admin panel starts a fresh one
+        self.sessions = {}
 
-    async def login(self):
-        # Implement your login logic here
-        # For now, let's just return True to simulate a successful login
-        await asyncio.sleep(1)  # Simulating some network delay
-        return True
+    def get_decoder_session(self, decoder):
+        key = session_key(decoder)
+        if key not in self.sessions:
+            # NDIDecoderN sections may override the [Settings] timeouts
+            connect_timeout = decoder.get('connect_timeout') or self.connect_timeout
+            read_timeout = decoder.get('read_timeout') or self.read_timeout
+            timeout = aiohttp.ClientTimeout(total=connect_timeout + read_timeout,
+                                            sock_connect=connect_timeout,
+                                            sock_read=read_timeout)
+            ip = decoder['ip']
+            breaker = CircuitBreaker(self.breaker_threshold, self.breaker_reset,
+                                     on_change=lambda state: self.breaker_changed(ip, state))
+            session = DecoderSession(decoder, timeout, self.relogin_statuses,
+                                     self.max_retries, self.retry_budget, breaker)
+            session.on_login = lambda result, seconds: self.login_recorded(decoder, result, seconds)
+            self.sessions[key] = session
+        return self.sessions[key]
 
-    async def change_source(self, source):
-        # Implement asynchronous source change
-        pass  # TODO: Implement source change logic
+    def login_recorded(self, decoder, result, seconds):
+        if self.journal is not None:
+            self.journal.record('login', decoder, result=result, latency=seconds)
 
-    async def close(self):
-        # Implement any cleanup logic here
-        pass
+    def breaker_changed(self, ip, state):
+        if state == OPEN:
+            metrics.inc('decoder_breaker_opened_total', decoder=ip)
+        if self.journal is not None:
+            self.journal.record('breaker', {'ip': ip}, detail=state, ok=state == CLOSED)
+        if self.on_breaker_change is not None:
+            self.on_breaker_change(ip, state)
+
+    async def login(self, decoder):
+        if not decoder.get('ip'):
+            return MwapiResult(False, error="No decoder IP set")
+        return await self.get_decoder_session(decoder).login()
+
+    async def ensure_login(self, decoder):
+        if not decoder.get('ip'):
+            return MwapiResult(False, error="No decoder IP set")
+        return await self.get_decoder_session(decoder).ensure_login()
 
-    # Other methods...
\ No newline at end of file
+    async def login_all(self, decoders):
+        # Pre-warms every decoder at once so later switches cost no extra round-trip
+        return await asyncio.gather(*(self.ensure_login(decoder) for decoder in decoders))
+
+    async def call(self, decoder, params):
+        if not decoder.get('ip'):
+            return MwapiResult(False, error="No decoder IP set")
+        return await self.get_decoder_session(decoder).call(params)
+
+    async def change_source(self, decoder, source):
+        params = {
+            "method": "set-channel",
+            "ndi-name": "true",
+            "name": source
+        }
+        # Covers any login or re-login the switch needed, so it is the time
+        # the operator actually waited
+        with metrics.span('decoder_change_source', decoder=decoder.get('ip')):
+            result = await self.call(decoder, params)
+        if not result.ok:
+            metrics.inc('decoder_change_source_failures_total', decoder=decoder.get('ip'))
+        return result
+
+    async def get_status(self, decoder):
+        return await self.call(decoder, {"method": "get-status"})
+
+    async def get_ndi_sources(self, decoder):
+        return await self.call(decoder, {"method": "get-ndi-sources"})
+
+    async def set_channels(self, assignments):
+        # assignments is a list of (decoder, source) pairs. All decoders are
+        # switched concurrently and the results come back in the same order.
+        return await asyncio.gather(*(self.change_source(decoder, source) for decoder, source in assignments))
+
+    async def prune(self, decoders):
+        # Closes cached sessions for decoders that were removed or edited
+        keep = {session_key(d) for d in decoders}
+        for key in [key for key in self.sessions if key not in keep]:
+            await self.sessions.pop(key).close()
+
+    async def close(self):
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions = {}
@@ -0,0 +1,36 @@
+from decoder_manager import find_channel_name
+from decoder_tasks import DecoderTasks
+
+# Seconds between status polls; the interval doubles while nothing changes
+DEFAULT_MIN_INTERVAL = 1
+DEFAULT_MAX_INTERVAL = 30
+
+class DecoderPoller(DecoderTasks):
+    # Polls every decoder's current channel and health on the AsyncRunner loop.
+    # on_change(decoder_index, online, channel) runs on the Tk thread, and only
+    # when that decoder's state differs from the last poll. kick() polls right
+    # away and resets the back-off, e.g. after a switch.
+    def __init__(self, decoder_manager, async_runner, on_change,
+                 min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL):
+        super().__init__(decoder_manager, async_runner, on_change)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.states = {}
+
+    def forget(self, index):
+        self.states.pop(index, None)
+
+    async def run(self, index, decoder, wakeup):
+        interval = self.min_interval
+        while True:
+            result = await self.decoder_manager.get_status(decoder)
+            state = (result.ok, find_channel_name(result.data) if result.ok else None)
+            if state != self.states.get(index):
+                self.states[index] = state
+                self.async_runner.post(self.on_change, index, *state)
+                interval = self.min_interval
+            else:
+                interval = min(interval * 2, self.max_interval)
+
+            if await self.wait(wakeup, interval):
+                interval = self.min_interval
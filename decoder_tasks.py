@@ -0,0 +1,61 @@
+import asyncio
+
+class DecoderTasks:
+    # One background task per decoder that has an IP, on the AsyncRunner loop.
+    # Subclasses implement run(index, decoder, wakeup), which loops until
+    # cancelled and cuts its wait short when wakeup is set, and forget(index)
+    # to drop what they kept for a decoder that was edited or removed.
+    def __init__(self, decoder_manager, async_runner, on_change):
+        self.decoder_manager = decoder_manager
+        self.async_runner = async_runner
+        self.on_change = on_change
+        self.tasks = {}
+        self.wakeups = {}
+        self.decoders = {}
+
+    def start(self, decoders):
+        # (Re)starts one task per decoder that has an IP
+        decoders = [dict(decoder) for decoder in decoders]
+        self.async_runner.submit(self.restart(decoders))
+
+    def stop(self):
+        return self.async_runner.submit(self.restart([]))
+
+    def kick(self, decoder_index):
+        # Runs the decoder's next round right away
+        self.async_runner.loop.call_soon_threadsafe(self.wake, decoder_index)
+
+    def wake(self, decoder_index):
+        event = self.wakeups.get(decoder_index)
+        if event is not None:
+            event.set()
+
+    async def restart(self, decoders):
+        # Decoders whose settings did not change keep their task and state
+        wanted = {index: decoder for index, decoder in enumerate(decoders) if decoder['ip']}
+        for index in list(self.tasks):
+            if wanted.get(index) != self.decoders.get(index):
+                self.tasks.pop(index).cancel()
+                self.wakeups.pop(index, None)
+                self.decoders.pop(index, None)
+                self.forget(index)
+        for index, decoder in wanted.items():
+            if index not in self.tasks:
+                self.decoders[index] = decoder
+                self.wakeups[index] = asyncio.Event()
+                self.tasks[index] = asyncio.create_task(self.run(index, decoder, self.wakeups[index]))
+
+    async def wait(self, wakeup, timeout):
+        # True if woken by kick() before timeout seconds passed
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        wakeup.clear()
+        return True
+
+    async def run(self, index, decoder, wakeup):
+        raise NotImplementedError
+
+    def forget(self, index):
+        pass
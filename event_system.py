@@ -1,17 +1,191 @@
+import asyncio
+import inspect
+import os
+import queue
+import socket
+import threading
+import time
+import tkinter as tk
+import weakref
+
+# Virtual event the waker thread sends Tk where it cannot watch a socket
+DRAIN_EVENT = '<<DrainQueue>>'
+
 class EventSystem:
+    # Listeners are called in priority order (highest first). Bound methods are
+    # held weakly so a destroyed widget or panel drops out on its own; other
+    # callables are held strongly unless weak=True. Coroutine listeners are
+    # scheduled on the asyncio loop given to set_loop().
+    #
+    # dispatch_event() runs listeners on the calling thread. post_event() and
+    # post_call() may be used from any thread: they go through one queue that
+    # the Tk thread drains, and the time each item waited there is recorded per
+    # event type. On POSIX a post writes a byte to a socket Tk watches with
+    # createfilehandler, so Tk sleeps until there is work. Elsewhere (Windows)
+    # a waker thread waits for posts and sends Tk a DRAIN_EVENT; only the
+    # waker blocks while Tk handles the cross-thread call, never the poster.
     def __init__(self):
         self.listeners = {}
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.loop = None
+        self.master = None
+        self.pending = queue.SimpleQueue()
+        self.latency = {}
+        self.wakeup_reader = None
+        self.wakeup_writer = None
+        self.wakeup_sent = False
+        self.wakeup_lock = threading.Lock()
+        self.waker = None
+        self.waker_event = threading.Event()
 
-    def add_listener(self, event_type, callback):
-        if event_type not in self.listeners:
-            self.listeners[event_type] = []
-        self.listeners[event_type].append(callback)
+    def add_listener(self, event_type, callback, priority=0, weak=None):
+        if weak is None:
+            weak = inspect.ismethod(callback)
+        if weak:
+            ref = weakref.WeakMethod(callback) if inspect.ismethod(callback) else weakref.ref(callback)
+        else:
+            ref = lambda: callback
+        with self.lock:
+            self.sequence += 1
+            entries = self.listeners.setdefault(event_type, [])
+            entries.append((-priority, self.sequence, ref))
+            entries.sort(key=lambda entry: entry[:2])
 
     def remove_listener(self, event_type, callback):
-        if event_type in self.listeners:
-            self.listeners[event_type].remove(callback)
+        with self.lock:
+            if event_type in self.listeners:
+                self.listeners[event_type] = [entry for entry in self.listeners[event_type]
+                                              if entry[2]() not in (None, callback)]
+
+    def set_loop(self, loop):
+        self.loop = loop
 
     def dispatch_event(self, event_type, *args, **kwargs):
-        if event_type in self.listeners:
-            for callback in self.listeners[event_type]:
-                callback(*args, **kwargs)
\ No newline at end of file
+        with self.lock:
+            entries = list(self.listeners.get(event_type, ()))
+        dead = False
+        for _, _, ref in entries:
+            callback = ref()
+            if callback is None:
+                dead = True
+                continue
+            result = callback(*args, **kwargs)
+            if inspect.iscoroutine(result):
+                self.schedule(result)
+        if dead:
+            with self.lock:
+                self.listeners[event_type] = [entry for entry in self.listeners.get(event_type, ())
+                                              if entry[2]() is not None]
+
+    def schedule(self, coro):
+        if self.loop is not None:
+            return asyncio.run_coroutine_threadsafe(coro, self.loop)
+        return asyncio.ensure_future(coro)  # Only valid inside a running loop
+
+    def attach_tk(self, master):
+        self.master = master
+        if os.name == 'posix':
+            try:
+                reader, writer = socket.socketpair()
+                reader.setblocking(False)
+                writer.setblocking(False)
+                master.tk.createfilehandler(reader, tk.READABLE, self.on_wakeup)
+                self.wakeup_reader, self.wakeup_writer = reader, writer
+            except (AttributeError, OSError, tk.TclError) as e:
+                print(f"Falling back to a waker thread for the event queue: {e}")
+        if self.wakeup_writer is None:
+            master.bind(DRAIN_EVENT, lambda event: self.drain())
+            self.waker = threading.Thread(target=self.run_waker, args=(master,), name="event-waker", daemon=True)
+            self.waker.start()
+        self.wake()  # Deliver anything posted before Tk was attached
+
+    def detach_tk(self):
+        if self.waker is not None:
+            self.master.unbind(DRAIN_EVENT)
+            self.waker = None
+            self.waker_event.set()  # Lets the waker see it is no longer needed
+        if self.wakeup_reader is not None:
+            self.master.tk.deletefilehandler(self.wakeup_reader)
+            self.wakeup_reader.close()
+            self.wakeup_writer.close()
+            self.wakeup_reader = self.wakeup_writer = None
+        self.master = None
+
+    def wake(self):
+        if self.waker is not None:
+            self.waker_event.set()
+            return
+        writer = self.wakeup_writer
+        if writer is None:
+            return
+        with self.wakeup_lock:
+            if self.wakeup_sent:
+                return
+            self.wakeup_sent = True
+        try:
+            writer.send(b'\0')
+        except OSError:
+            pass  # Socket full or closed; a wakeup is already pending or Tk is gone
+
+    def run_waker(self, master):
+        while True:
+            self.waker_event.wait()
+            if self.master is not master or self.waker is None:
+                return
+            # Cleared before Tk drains so anything posted meanwhile signals again
+            self.waker_event.clear()
+            try:
+                master.event_generate(DRAIN_EVENT, when='tail')
+            except RuntimeError:
+                # mainloop() has not started yet (or has ended); try again shortly
+                self.waker_event.set()
+                time.sleep(0.1)
+            except tk.TclError:
+                return  # The window is gone
+
+    def on_wakeup(self, reader, mask):
+        try:
+            while reader.recv(4096):
+                pass
+        except OSError:
+            pass
+        # Cleared before draining so anything posted meanwhile signals again
+        with self.wakeup_lock:
+            self.wakeup_sent = False
+        self.drain()
+
+    def post_event(self, event_type, *args, **kwargs):
+        self.pending.put((event_type, None, args, kwargs, time.perf_counter()))
+        self.wake()
+
+    def post_call(self, callback, *args, event_type=None):
+        # Runs callback(*args) on the Tk thread; event_type labels its latency
+        if event_type is None:
+            event_type = f"call:{getattr(callback, '__name__', 'call')}"
+        self.pending.put((event_type, callback, args, {}, time.perf_counter()))
+        self.wake()
+
+    def drain(self):
+        while True:
+            try:
+                event_type, callback, args, kwargs, posted = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            self.record_latency(event_type, time.perf_counter() - posted)
+            try:
+                if callback is None:
+                    self.dispatch_event(event_type, *args, **kwargs)
+                else:
+                    callback(*args, **kwargs)
+            except Exception as e:
+                print(f"Error handling {event_type}: {e}")
+
+    def record_latency(self, event_type, seconds):
+        count, total, worst = self.latency.get(event_type, (0, 0.0, 0.0))
+        self.latency[event_type] = (count + 1, total + seconds, max(worst, seconds))
+
+    def latency_stats(self):
+        # {event_type: (count, mean seconds, max seconds)} for queued delivery
+        return {event_type: (count, total / count, worst)
+                for event_type, (count, total, worst) in self.latency.items()}
@@ -0,0 +1,150 @@
+import bisect
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds, from a local cache hit to a timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, share):
+        # Upper bound of the bucket holding the share-th observation
+        if not self.count:
+            return 0.0
+        rank = share * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+class Span:
+    # with metrics.span('name', decoder=ip): ... records the block's duration
+    # as name_seconds, and counts name_errors_total if it raises
+    __slots__ = ('metrics', 'name', 'labels', 'started')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(f"{self.name}_seconds", time.perf_counter() - self.started, **self.labels)
+        if exc_type is not None:
+            self.metrics.inc(f"{self.name}_errors_total", **self.labels)
+        return False
+
+class Metrics:
+    # Histograms and counters keyed by name and labels (e.g. decoder=<ip>).
+    # Recording is a dict lookup and a bisect under a lock, cheap enough to
+    # leave on; nothing is formatted until a summary or a scrape asks for it.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def span(self, name, **labels):
+        return Span(self, name, labels)
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def summary(self):
+        # [(name, labels, count, mean, p50, p99, max)] in seconds, for display
+        with self.lock:
+            return [(name, dict(labels), h.count, h.sum / h.count, h.quantile(0.5), h.quantile(0.99), h.max)
+                    for (name, labels), h in sorted(self.histograms.items()) if h.count]
+
+    def counter_summary(self):
+        with self.lock:
+            return [(name, dict(labels), value) for (name, labels), value in sorted(self.counters.items())]
+
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            declared = set()
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name not in declared:
+                    lines.append(f"# TYPE {name} histogram")
+                    declared.add(name)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{format_labels(labels, le=repr(bound))} {cumulative}")
+                lines.append(f"{name}_bucket{format_labels(labels, le='+Inf')} {histogram.count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in declared:
+                    lines.append(f"# TYPE {name} counter")
+                    declared.add(name)
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in pairs) + '}'
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Shared by every module, like the logger in app_log
+metrics = Metrics()
+
+def start_metrics_server(port, host='127.0.0.1', registry=metrics):
+    # Serves /metrics in Prometheus text format from a daemon thread. Bound to
+    # loopback by default; call shutdown() on the returned server to stop it.
+    # http.server pulls in ssl and email, so it is only imported when the
+    # endpoint is turned on.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            data = self.server.metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    server.metrics = registry
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
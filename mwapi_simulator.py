@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import hashlib
+import random
+import threading
+import time
+import uuid
+from aiohttp import web
+
+# mwapi status codes the simulator answers with
+STATUS_OK = 0
+STATUS_FAILED = 1
+STATUS_NOT_LOGGED_IN = 37
+
+DEFAULT_SOURCES = [f"SIM-PC (Camera {i})" for i in range(1, 9)]
+
+class SimulatedDecoder:
+    # Stand-in for one decoder's /mwapi endpoint, for benchmarks and for
+    # running the app without hardware (set a decoder's IP to 127.0.0.1:<port>).
+    # latency and jitter are in seconds; failure_rate is the share of requests
+    # answered with an mwapi error; a sid stops being accepted session_ttl
+    # seconds after login (0 keeps it forever).
+    def __init__(self, username='Admin', password='Admin', sources=None, latency=0.0, jitter=0.0,
+                 failure_rate=0.0, session_ttl=0, seed=None):
+        self.username = username
+        self.password_md5 = hashlib.md5(password.encode()).hexdigest()
+        self.sources = list(sources if sources is not None else DEFAULT_SOURCES)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.session_ttl = session_ttl
+        self.random = random.Random(seed)
+        self.channel = self.sources[0] if self.sources else ''
+        self.sessions = {}  # sid -> expiry (monotonic), or None
+        self.counts = {}  # method -> requests answered
+        self.runner = None
+        self.port = None
+
+    async def handle(self, request):
+        method = request.query.get('method', '')
+        self.counts[method] = self.counts.get(method, 0) + 1
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if method == 'login':
+            return self.login(request)
+        if not self.logged_in(request.cookies.get('sid')):
+            return web.json_response({'status': STATUS_NOT_LOGGED_IN})
+        if self.failure_rate and self.random.random() < self.failure_rate:
+            return web.json_response({'status': STATUS_FAILED})
+        if method == 'set-channel':
+            name = request.query.get('name', '')
+            if self.sources and name not in self.sources:
+                return web.json_response({'status': STATUS_FAILED})
+            self.channel = name
+            return web.json_response({'status': STATUS_OK})
+        if method == 'get-status':
+            return web.json_response({'status': STATUS_OK, 'channel': {'ndi-name': self.channel}})
+        if method == 'get-ndi-sources':
+            return web.json_response({'status': STATUS_OK,
+                                      'sources': [{'name': source} for source in self.sources]})
+        return web.json_response({'status': STATUS_FAILED})
+
+    def login(self, request):
+        if request.query.get('id') != self.username or request.query.get('pass') != self.password_md5:
+            return web.json_response({'status': STATUS_FAILED})
+        sid = uuid.uuid4().hex
+        self.sessions[sid] = time.monotonic() + self.session_ttl if self.session_ttl else None
+        response = web.json_response({'status': STATUS_OK})
+        response.set_cookie('sid', sid)
+        return response
+
+    def logged_in(self, sid):
+        if sid not in self.sessions:
+            return False
+        expires_at = self.sessions[sid]
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self.sessions[sid]
+            return False
+        return True
+
+    async def start(self, host='127.0.0.1', port=0):
+        app = web.Application()
+        app.router.add_get('/mwapi', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+        return self.port
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+class SimulatorThread:
+    # Serves a set of simulated decoders from their own event loop, so the
+    # client being measured does not share a loop with the servers
+    def __init__(self, decoders, host='127.0.0.1'):
+        self.decoders = decoders
+        self.host = host
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="mwapi-simulator", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        for decoder in self.decoders:
+            asyncio.run_coroutine_threadsafe(decoder.start(self.host), self.loop).result()
+        return [f"{self.host}:{decoder.port}" for decoder in self.decoders]
+
+    def stop(self):
+        for decoder in self.decoders:
+            asyncio.run_coroutine_threadsafe(decoder.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+async def serve(args):
+    decoders = []
+    for i in range(args.count):
+        decoder = SimulatedDecoder(args.username, args.password, latency=args.latency, jitter=args.jitter,
+                                   failure_rate=args.failure_rate, session_ttl=args.session_ttl)
+        port = await decoder.start(args.host, args.port + i if args.port else 0)
+        print(f"Simulated decoder {i + 1} at {args.host}:{port}")
+        decoders.append(decoder)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for decoder in decoders:
+            await decoder.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve simulated mwapi decoders on loopback")
+    parser.add_argument("--count", type=int, default=1, help="Number of decoders")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8081, help="Port of the first decoder; the rest follow (0 picks free ports)")
+    parser.add_argument("--username", default='Admin')
+    parser.add_argument("--password", default='Admin')
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.005, help="Random +/- seconds on top of the latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests that fail (0-1)")
+    parser.add_argument("--session-ttl", type=float, default=0, help="Seconds a login stays valid (0 = forever)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,31 @@
-import configparser
+import importlib
 import tkinter as tk
 from tkinter import messagebox
-import requests
-import hashlib
 import urllib.parse
-import math
 import time
 import tkinter.ttk as ttk
-from PIL import Image, ImageTk  # Make sure to install pillow: pip install pillow
-import datetime
+import logging
 import os
-
-class ScrollableFrame(ttk.Frame):
-    def __init__(self, container, *args, **kwargs):
-        super().__init__(container, *args, **kwargs)
-        canvas = tk.Canvas(self, bg='#1c1c1e')
-        scrollbar = ttk.Scrollbar(self, orient="vertical", command=canvas.yview)
-        self.scrollable_frame = ttk.Frame(canvas)
-
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(
-                scrollregion=canvas.bbox("all")
-            )
-        )
-
-        canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+from app_log import LogBuffer, logger, parse_level, start_file_logging
+import threading
+from circuit_breaker import CLOSED, HALF_OPEN
+from config_manager import ConfigManager
+from config_model import DEFAULT_WELCOME, AppConfig
+from event_system import EventSystem
+from metrics import metrics, start_metrics_server
+from source_registry import SourceRegistry
+from state_snapshot import load_snapshot, save_snapshot
+from ui_components import (FRAME_MS, ScrollableFrame, SourceGrid, ThumbnailCache, VirtualList, cache_dir,
+                           prepare_background_image)
+# The decoder modules pull in aiohttp, which is most of the import time; they
+# are imported on a worker thread by start_backend() once the window has painted
+BACKEND_MODULES = ('async_runner', 'control_api', 'decoder_manager', 'decoder_poller', 'source_discovery',
+                   'switch_journal')
+
+# ms to wait after a state change before rewriting the startup snapshot
+SNAPSHOT_DELAY = 5000
+# Shortest decoder button before the decoder column starts scrolling
+DECODER_ROW_HEIGHT = 70
 
 class AdminPanel(tk.Frame):
     def __init__(self, master, app):
@@ -54,7 +50,7 @@ class AdminPanel(tk.Frame):
         self.create_widgets()
 
     def create_widgets(self):
-        self.scrollable_frame = ScrollableFrame(self)
+        self.scrollable_frame = ScrollableFrame(self, bg='#1c1c1e')
         self.scrollable_frame.pack(fill="both", expand=True)
 
         frame = self.scrollable_frame.scrollable_frame
@@ -114,10 +110,23 @@ class AdminPanel(tk.Frame):
         
         self.log_text = tk.Text(log_frame, bg='#333333', fg='white', font=("Roboto", 12), height=10)
         self.log_text.pack(fill=tk.BOTH, expand=True)
+        self.app.log_buffer.attach(self.log_text)
         
         # Make the log frame expandable
         frame.grid_rowconfigure(4, weight=1)
 
+        # Timing summary; only formatted when the panel asks for it
+        metrics_frame = ttk.LabelFrame(frame, text="Metrics", style='Dark.TLabelframe')
+        metrics_frame.grid(row=5, column=0, columnspan=3, sticky="nsew", padx=10, pady=10)
+
+        refresh_metrics_btn = tk.Button(metrics_frame, text="Refresh Metrics", command=self.refresh_metrics,
+                                        bg='#333333', fg='white', font=("Roboto", 12))
+        refresh_metrics_btn.pack(anchor='w', pady=(0, 5))
+
+        self.metrics_text = tk.Text(metrics_frame, bg='#333333', fg='white', font=("Courier", 11), height=10)
+        self.metrics_text.pack(fill=tk.BOTH, expand=True)
+        self.refresh_metrics()
+
     def create_section(self, parent, title, fields):
         section_frame = ttk.LabelFrame(parent, text=title, style='Dark.TLabelframe')
         
@@ -135,9 +144,9 @@ class AdminPanel(tk.Frame):
             elif entry_var == 'select_decoder_entry':
                 entry.insert(0, self.app.config['Messages'].get('select_decoder', 'Select Decoder'))
             elif entry_var == 'sources_entry':
-                entry.insert(0, ','.join(self.app.sources))
+                entry.insert(0, ','.join(self.app.registry.ndi_names()))
             elif entry_var == 'names_entry':
-                entry.insert(0, ','.join(self.app.user_friendly_names))
+                entry.insert(0, ','.join(self.app.registry.friendly_names()))
             elif entry_var == 'num_decoders_entry':
                 entry.insert(0, str(len(self.app.decoders)))
 
@@ -181,10 +190,7 @@ class AdminPanel(tk.Frame):
 
     def update_welcome_message(self):
         new_message = self.welcome_entry.get()
-        self.app.config['Messages']['welcome'] = new_message
-        self.app.save_config()
-        self.app.welcome_message = new_message
-        self.app.welcome_label.config(text=new_message)
+        self.app.config_manager.set('Messages', 'welcome', new_message)
 
     def update_decoders(self):
         num_decoders = int(self.num_decoders_entry.get())
@@ -206,26 +212,35 @@ class AdminPanel(tk.Frame):
 
     def update_select_source_text(self):
         new_text = self.select_source_entry.get()
-        self.app.config['Messages']['select_source'] = new_text
-        self.app.save_config()
+        self.app.config_manager.set('Messages', 'select_source', new_text)
 
     def update_select_decoder_text(self):
         new_text = self.select_decoder_entry.get()
-        self.app.config['Messages']['select_decoder'] = new_text
-        self.app.save_config()
+        self.app.config_manager.set('Messages', 'select_decoder', new_text)
+
+    def refresh_metrics(self):
+        lines = [f"{'span':<34}{'labels':<34}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for name, labels, count, mean, p50, p99, worst in metrics.summary():
+            label_text = ','.join(f"{key}={value}" for key, value in labels.items())
+            lines.append(f"{name:<34}{label_text:<34}{count:>8}{mean * 1000:>10.1f}{p50 * 1000:>10.1f}"
+                         f"{p99 * 1000:>10.1f}{worst * 1000:>10.1f}")
+        for name, labels, value in metrics.counter_summary():
+            label_text = ','.join(f"{key}={value}" for key, value in labels.items())
+            lines.append(f"{name:<34}{label_text:<34}{value:>8}")
+        self.metrics_text.delete('1.0', tk.END)
+        self.metrics_text.insert(tk.END, '\n'.join(lines))
 
     def close_app(self):
+        self.app.cleanup()
         self.master.quit()
 
     def close_panel(self):
         self.pack_forget()
         self.app.show_main_interface()
 
-    def add_log(self, message):
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message}\n"
-        self.log_text.insert(tk.END, log_entry)
-        self.log_text.see(tk.END)  # Scroll to the end
+    def add_log(self, message, level=logging.INFO, **fields):
+        # fields are kept as structured data in the log file
+        logger.log(level, message, extra={'fields': fields})
 
 class NDIDecoderControl:
     def __init__(self, master):
@@ -244,45 +259,117 @@ class NDIDecoderControl:
         style.configure('TLabelframe.Label', background='#1c1c1e', foreground='white', font=("Roboto", 16))
 
         # Initialize components
+        self.startup_started = time.perf_counter()
+        self.startup_phases = {}
         self.initialize_components()
 
         # Start in Admin Panel
         self.open_admin_panel()
 
+        # Network, image and heavy imports wait until Tk has had a frame to
+        # paint the window from config.ini and the startup snapshot
+        self.master.after(FRAME_MS, self.start_backend)
+
+    def end_startup_phase(self, phase):
+        # Times are kept per phase and in the metrics, and logged once the
+        # start has finished, so cold starts can be compared across reboots
+        now = time.perf_counter()
+        seconds = now - self.phase_started
+        self.phase_started = now
+        self.startup_phases[phase] = seconds
+        metrics.observe('startup_phase_seconds', seconds, phase=phase)
+
     def initialize_components(self):
-        # Read configuration
-        self.config = configparser.ConfigParser()
-        self.config.read('config.ini')
+        # Read configuration; writes are batched and done off the UI thread
+        self.phase_started = self.startup_started
+        self.config_manager = ConfigManager('config.ini')
+        self.config = self.config_manager.config
 
-        # Ensure Messages section exists
+        # Ensure Messages and Settings sections exist
         if 'Messages' not in self.config:
-            self.config['Messages'] = {'welcome': 'Welcome to NDI Decoder Control!'}
-            self.save_config()
+            self.config_manager.add_section('Messages', {'welcome': DEFAULT_WELCOME})
+        if 'Settings' not in self.config:
+            self.config_manager.add_section('Settings', {'last_decoder': '0'})
+
+        # Parsed once here; later reloads only publish what changed
+        self.model = AppConfig.from_parser(self.config)
+        # Events from network threads reach Tk through this one queue
+        self.event_system = EventSystem()
+        self.event_system.attach_tk(self.master)
+
+        # Bounded on-screen log for the admin panel, plus a rotating log file
+        # written from a background thread
+        settings = self.model.settings
+        self.log_buffer = LogBuffer(self.master, max_lines=int(settings.get('log_lines', '500')),
+                                    level=parse_level(settings.get('log_level', 'INFO')))
+        logger.addHandler(self.log_buffer)
+        log_file = settings.get('log_file') or os.path.join(cache_dir(), 'ndi_decoder_control.log')
+        self.log_listener = start_file_logging(log_file, parse_level(settings.get('file_log_level', 'INFO')))
+
+        # Optional Prometheus endpoint on loopback, off unless a port is set
+        self.metrics_server = None
+        if settings.get('metrics_port'):
+            try:
+                self.metrics_server = start_metrics_server(int(settings['metrics_port']))
+            except (OSError, ValueError) as e:
+                print(f"Error starting metrics endpoint: {e}")
+        self.event_system.add_listener('sources_changed', self.on_sources_changed)
+        self.event_system.add_listener('active_source_changed', self.on_active_source_changed)
+        self.event_system.add_listener('decoders_changed', self.on_decoders_changed)
+        self.event_system.add_listener('messages_changed', self.on_messages_changed)
+        self.event_system.add_listener('presets_changed', self.on_presets_changed)
+        self.event_system.add_listener('previews_changed', self.on_previews_changed)
+        self.end_startup_phase('config')
 
         # Decoder settings
-        self.decoders = []
-        for section in self.config.sections():
-            if section.startswith('NDIDecoder'):
-                decoder = {
-                    'ip': self.config[section].get('ip', ''),
-                    'username': self.config[section].get('username', ''),
-                    'password': self.config[section].get('password', ''),
-                    'name': self.config[section].get('name', f"Decoder {len(self.decoders) + 1}")
-                }
-                self.decoders.append(decoder)
+        self.decoders = [decoder.as_dict() for decoder in self.model.decoders]
 
         # Remember last selected decoder
-        self.current_decoder_index = int(self.config.get('Settings', 'last_decoder', fallback='0'))
+        self.current_decoder_index = int(self.model.settings.get('last_decoder', '0'))
         self.set_decoder(self.current_decoder_index)
 
-        # NDI Sources
-        self.sources = [value for key, value in self.config['NDI_Sources'].items() if key.startswith('source')]
-        self.user_friendly_names = [value for key, value in self.config['User_Friendly_Names'].items() if key.startswith('source')]
-        self.active_source = self.config['NDI_Sources'].get('active_source', self.sources[0])
-        self.active_source_name = self.user_friendly_names[self.sources.index(self.active_source)]
+        # Scene presets routing several decoders at once
+        self.presets = self.model.presets
 
-        # Session for maintaining login
-        self.session = requests.Session()
+        # NDI Sources
+        self.apply_sources(self.model.sources)
+        self.active_source = self.model.active_source
+        self.active_source_name = self.source_name(self.active_source)
+
+        # Decoder requests run on a background asyncio loop; results come back
+        # to Tk. All of it is created by finish_backend() after the first paint.
+        self.decoder_manager = None
+        self.async_runner = None
+        self.decoder_poller = None
+        self.source_discovery = None
+        # Routing shared with the control API; lives on the asyncio loop
+        self.core = None
+        self.control_api = None
+        self.preview_fetcher = None
+        self.journal = None
+        # Circuit breaker state per decoder IP, shown on the decoder buttons
+        self.breaker_states = {}
+        self.source_grid = None
+        self.resize_job = None
+        self.background_image = None
+        self.closed = False
+
+        # What each decoder reports it is showing (kept current by the poller)
+        # and the NDI sources it can see (refreshed in the background, so the
+        # grid can dim unreachable sources without a request on every tap).
+        # Both start from the snapshot the last run left behind.
+        self.decoder_states = {}
+        self.decoder_sources = {}
+        # Taps are highlighted before the decoder answers: the latest tap per
+        # decoder as (sequence number, source), and what to go back to if it
+        # fails. Taps are told apart by number, since A, B, A repeats a source.
+        self.switch_targets = {}
+        self.switch_fallbacks = {}
+        self.switch_seq = 0
+        self.decoder_list = None
+        self.snapshot_path = os.path.join(cache_dir(), 'state.json')
+        self.snapshot_job = None
+        self.apply_snapshot(load_snapshot(self.snapshot_path))
 
         # Main interface frame
         self.main_frame = tk.Frame(self.master, bg='#1c1c1e')
@@ -301,19 +388,13 @@ class NDIDecoderControl:
         else:
             self.content_frame.pack(fill=tk.BOTH, expand=True)
 
-        # Load and prepare the background image
-        self.load_background_image()
-
-        # Create a canvas for the background image and content
+        # Create a canvas for the background image and content; the image is
+        # added once a worker thread has it ready
         self.canvas = tk.Canvas(self.content_frame, bg='#1c1c1e', highlightthickness=0)
         self.canvas.pack(fill=tk.BOTH, expand=True)
 
-        # Add the background image to the canvas if it was loaded successfully
-        if self.background_image:
-            self.canvas.create_image(self.master.winfo_screenwidth(), 0, anchor=tk.NE, image=self.background_image)
-
         # Welcome message label (left-justified and 10% larger)
-        self.welcome_message = self.config['Messages'].get('welcome', 'Welcome to NDI Decoder Control!')
+        self.welcome_message = self.model.message('welcome', DEFAULT_WELCOME)
         self.welcome_label = self.canvas.create_text(20, 20, text=self.welcome_message, fill='white', font=("Roboto", 31), anchor='nw')
 
         # Frame for buttons
@@ -336,81 +417,317 @@ class NDIDecoderControl:
         # Create decoder selection buttons
         self.create_decoder_selection()
 
-        # Login first
-        if self.login():
-            self.create_buttons()
-            self.update_buttons()
-
-    def load_background_image(self):
+        # Source buttons are painted from config.ini straight away, showing
+        # the last-known channel; they no longer wait for a login
+        _, channel = self.decoder_states.get(self.current_decoder_index, (True, None))
+        if channel:
+            self.set_active_source(channel)
+        self.create_buttons()
+        self.update_buttons()
+        if self.decoders:
+            self.update_active_source_label()
+        self.end_startup_phase('paint')
+
+    def start_backend(self):
+        if self.closed:
+            return
+        self.end_startup_phase('first_frame')
+        # The window keeps taking input while the imports run
+        threading.Thread(target=self.import_backend, name="backend-imports", daemon=True).start()
+
+    def import_backend(self):
+        # Worker thread; the rest of the start runs on Tk once the modules are loaded
+        for module in BACKEND_MODULES:
+            importlib.import_module(module)
+        self.event_system.post_call(self.finish_backend)
+
+    def finish_backend(self):
+        if self.closed:
+            return
+        from async_runner import AsyncRunner
+        from control_api import ControlAPI, DEFAULT_API_HOST, make_core
+        from decoder_manager import DecoderManager
+        from decoder_poller import DecoderPoller
+        from source_discovery import SourceDiscovery
+        from switch_journal import SwitchJournal, journal_path
+        self.end_startup_phase('imports')
+
+        self.decoder_manager = DecoderManager(self.config_manager)
+        self.async_runner = AsyncRunner(self.event_system)
+        self.core = make_core(self.decoder_manager, self.model.settings)
+        self.configure_core()
+        # Switches made through the API are shown here as well
+        self.core.subscribe(self.on_core_event_threadsafe)
+        self.decoder_manager.on_breaker_change = self.on_breaker_change_threadsafe
+        # Switches from every panel, logins and breaker changes, in SQLite
+        path = journal_path(self.model.settings, self.config_manager.config_file)
+        if path:
+            self.journal = SwitchJournal(path)
+            self.core.journal = self.decoder_manager.journal = self.journal
+        self.decoder_poller = DecoderPoller(
+            self.decoder_manager, self.async_runner, self.on_decoder_state,
+            min_interval=float(self.config.get('Settings', 'poll_min_interval', fallback='1')),
+            max_interval=float(self.config.get('Settings', 'poll_max_interval', fallback='30')))
+        self.source_discovery = SourceDiscovery(
+            self.decoder_manager, self.async_runner, self.on_decoder_sources,
+            ttl=float(self.config.get('Settings', 'discovery_ttl', fallback='30')))
+
+        # Log in to all decoders up front
+        self.login()
+        self.decoder_poller.start(self.decoders)
+        self.source_discovery.start(self.decoders)
+        self.start_previews()
+
+        # Optional HTTP + WebSocket API for remote panels, off unless a port is set
+        settings = self.model.settings
+        if settings.get('api_port'):
+            self.control_api = ControlAPI(self.core, settings.get('api_token') or None)
+            host = settings.get('api_host') or DEFAULT_API_HOST
+            self.async_runner.submit(self.control_api.start(host, int(settings['api_port'])),
+                                     self.on_control_api_started)
+        self.end_startup_phase('backend')
+
+        # The logo is resized on a worker thread the first time; Tk only reads
+        # the cached PNG
+        image_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ERDCLogo.png")
+        threading.Thread(target=self.prepare_background_image, name="background-image", daemon=True,
+                         args=(image_path, self.master.winfo_screenwidth(), self.master.winfo_screenheight())).start()
+
+    def configure_core(self):
+        self.async_runner.call(self.core.configure, [dict(decoder) for decoder in self.decoders],
+                               self.registry, dict(self.presets))
+
+    def on_control_api_started(self, address):
+        self.admin_panel.add_log(f"Control API listening on http://{address[0]}:{address[1]}")
+
+    def on_breaker_change_threadsafe(self, ip, state):
+        # Called on the asyncio loop
+        self.core.set_breaker(ip, state)
+        self.async_runner.post(self.on_breaker_change, ip, state)
+
+    def on_core_event_threadsafe(self, event):
+        # Called on the asyncio loop; only remote switches need the UI
+        if event['type'] == 'switched' and event['origin'] != 'kiosk':
+            self.async_runner.post(self.on_remote_switch, event['decoder'], event['source'], event['origin'])
+
+    def on_remote_switch(self, decoder_index, source, origin):
+        if decoder_index >= len(self.decoders):
+            return
+        decoder_name = self.decoders[decoder_index].get('name')
+        self.admin_panel.add_log(f"{decoder_name} switched to {self.source_name(source)} by {origin}",
+                                 decoder=decoder_name, source=source, origin=origin)
+        self.decoder_poller.kick(decoder_index)
+        if decoder_index == self.current_decoder_index:
+            self.config_manager.set('NDI_Sources', 'active_source', source)
+        self.on_decoder_channel(decoder_index, source)
+
+    def prepare_background_image(self, image_path, width, height):
         try:
-            # Load the image from the same directory as the script
-            image_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ERDCLogo.png")
-            image = Image.open(image_path)
-            
-            # Calculate the new size (assuming the window is 1920x1080)
-            window_width = 1920
-            window_height = 1080
-            image_width = int(window_width * 1.5)  # Make the image 1.5 times wider than the window
-            image_height = int(image_width / image.width * image.height)
-            
-            # Resize the image
-            image = image.resize((image_width, image_height), Image.LANCZOS)
-            
-            # Create a new image with an alpha channel
-            image_with_opacity = Image.new("RGBA", image.size, (0, 0, 0, 0))
-            
-            # Paste the original image onto the new image, using the original as a mask
-            image_with_opacity.paste(image, (0, 0), image)
-            
-            # Apply 15% opacity
-            data = image_with_opacity.getdata()
-            new_data = [(d[0], d[1], d[2], int(d[3] * 0.15)) for d in data]
-            image_with_opacity.putdata(new_data)
-            
-            # Convert to PhotoImage
-            self.background_image = ImageTk.PhotoImage(image_with_opacity)
+            with metrics.span('ui_prepare_background_image'):
+                # Sized for the real screen; processed once and then cached on disk
+                cache_path = prepare_background_image(image_path, width, height)
         except FileNotFoundError:
             print(f"Warning: Background image '{image_path}' not found. Using a solid color background instead.")
-            # Create a solid color image as a fallback
-            self.background_image = None
+            cache_path = None
         except Exception as e:
             print(f"Error loading background image: {e}")
-            self.background_image = None
+            cache_path = None
+        self.event_system.post_call(self.load_background_image, cache_path)
+
+    def load_background_image(self, cache_path):
+        if cache_path is not None and not self.closed:
+            with metrics.span('ui_load_background_image'):
+                try:
+                    self.background_image = tk.PhotoImage(file=cache_path)
+                    image_item = self.canvas.create_image(self.master.winfo_screenwidth(), 0, anchor=tk.NE,
+                                                          image=self.background_image)
+                    self.canvas.tag_lower(image_item)  # Behind the text and buttons
+                except tk.TclError as e:
+                    print(f"Error loading background image: {e}")
+        self.end_startup_phase('background_image')
+        total = time.perf_counter() - self.startup_started
+        metrics.observe('startup_seconds', total)
+        phases = ', '.join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.startup_phases.items())
+        self.admin_panel.add_log(f"Started in {total * 1000:.0f} ms ({phases})",
+                                 startup_ms=round(total * 1000), **{f"{phase}_ms": round(seconds * 1000)
+                                                                    for phase, seconds in self.startup_phases.items()})
+        self.schedule_snapshot()
+
+    def apply_snapshot(self, snapshot):
+        # Only entries for decoders whose IP still matches are used
+        saved = snapshot.get('decoders', {})
+        for index, decoder in enumerate(self.decoders):
+            state = saved.get(decoder['ip']) if decoder['ip'] else None
+            if not state:
+                continue
+            self.decoder_states[index] = (state.get('online', True), state.get('channel'))
+            if state.get('sources') is not None:
+                self.decoder_sources[index] = frozenset(state['sources'])
+
+    def schedule_snapshot(self):
+        if self.snapshot_job is None and not self.closed:
+            self.snapshot_job = self.master.after(SNAPSHOT_DELAY, self.write_snapshot)
+
+    def write_snapshot(self):
+        self.snapshot_job = None
+        decoders = {}
+        for index, decoder in enumerate(self.decoders):
+            if not decoder['ip']:
+                continue
+            online, channel = self.decoder_states.get(index, (True, None))
+            sources = self.decoder_sources.get(index)
+            decoders[decoder['ip']] = {'online': online, 'channel': channel,
+                                       'sources': sorted(sources) if sources is not None else None}
+        save_snapshot(self.snapshot_path, {
+            'decoders': decoders,
+            'startup_ms': {phase: round(seconds * 1000) for phase, seconds in self.startup_phases.items()}
+        })
 
     def create_decoder_selection(self):
+        # Rebuilt when the decoder list or its texts change; selecting a
+        # decoder or a health change only repaints the rows involved
         for widget in self.decoder_selection_frame.winfo_children():
             widget.destroy()
+        self.decoder_list = None
 
         if len(self.decoders) > 1:
-            select_decoder_text = self.config['Messages'].get('select_decoder', 'Select Decoder')
+            select_decoder_text = self.model.message('select_decoder', 'Select Decoder')
             tk.Label(self.decoder_selection_frame, text=select_decoder_text, bg='#2a2a2a', fg='white', font=("Roboto", 16)).pack(pady=(10, 2), fill=tk.X)
 
-            num_decoders = len(self.decoders)
-            button_height = (self.master.winfo_height() - 50) // num_decoders  # 50 pixels for the "Select Decoder" label
-
-            for i, decoder in enumerate(self.decoders):
-                btn = tk.Button(self.decoder_selection_frame, 
-                                text=decoder.get('name', f"Decoder {i+1}"),  # Use custom name if available
-                                command=lambda x=i: self.select_decoder(x),
-                                bg='#333333' if i != self.current_decoder_index else '#3b3b3d',
-                                fg='white', 
-                                relief='flat',
-                                activebackground='#555555',
-                                activeforeground='white',
-                                font=("Roboto", 14),
-                                bd=0, 
-                                highlightthickness=0)
-                btn.pack(fill=tk.BOTH, expand=True)
+            if self.presets:
+                self.create_preset_buttons()
+
+            # Buttons share the column height while they fit and scroll after
+            # that; only the visible ones exist
+            self.decoder_list = VirtualList(self.decoder_selection_frame, self.make_decoder_button,
+                                            self.render_decoder_button, row_height=DECODER_ROW_HEIGHT,
+                                            fill=True, bg='#2a2a2a')
+            self.decoder_list.pack(fill=tk.BOTH, expand=True)
+            self.decoder_list.set_count(len(self.decoders))
+            self.decoder_list.see(self.current_decoder_index)
+
+    def make_decoder_button(self, parent):
+        return tk.Button(parent,
+                         relief='flat',
+                         activebackground='#555555',
+                         activeforeground='white',
+                         font=("Roboto", 14),
+                         bd=0,
+                         highlightthickness=0)
+
+    def render_decoder_button(self, btn, index):
+        btn.config(text=self.decoder_label(index),
+                   command=lambda x=index: self.select_decoder(x),
+                   bg='#333333' if index != self.current_decoder_index else '#3b3b3d',
+                   fg=self.decoder_foreground(index))
+
+    def refresh_decoder_button(self, index):
+        if self.decoder_list is not None and 0 <= index < len(self.decoders):
+            self.decoder_list.refresh(index)
+
+    def decoder_foreground(self, index):
+        online, _ = self.decoder_states.get(index, (True, None))
+        breaker = self.breaker_states.get(self.decoders[index]['ip'], CLOSED)
+        return 'white' if online and breaker == CLOSED else '#808080'  # Dim decoders that stopped answering
+
+    def decoder_label(self, index):
+        name = self.decoders[index].get('name', f"Decoder {index + 1}")  # Use custom name if available
+        breaker = self.breaker_states.get(self.decoders[index]['ip'], CLOSED)
+        if breaker == CLOSED:
+            return name
+        return f"{name}\n({'reconnecting' if breaker == HALF_OPEN else 'offline'})"
+
+    def on_breaker_change(self, ip, state):
+        previous = self.breaker_states.get(ip, CLOSED)
+        self.breaker_states[ip] = state
+        for index, decoder in enumerate(self.decoders):
+            if decoder['ip'] != ip:
+                continue
+            self.refresh_decoder_button(index)
+            if state == CLOSED:
+                self.admin_panel.add_log(f"{decoder.get('name')} is reachable again", decoder=decoder.get('name'))
+                self.decoder_poller.kick(index)
+            elif previous == CLOSED:
+                self.admin_panel.add_log(f"{decoder.get('name')} is not responding; requests fail fast until it answers",
+                                         logging.WARNING, decoder=decoder.get('name'))
+
+    def create_preset_buttons(self):
+        presets_frame = tk.Frame(self.decoder_selection_frame, bg='#2a2a2a')
+        presets_frame.pack(side=tk.BOTTOM, fill=tk.X)
+
+        presets_text = self.model.message('presets', 'Presets')
+        tk.Label(presets_frame, text=presets_text, bg='#2a2a2a', fg='white', font=("Roboto", 16)).pack(pady=(10, 2), fill=tk.X)
+
+        for name in self.presets:
+            btn = tk.Button(presets_frame,
+                            text=name,
+                            command=lambda x=name: self.recall_preset(x),
+                            bg='#333333',
+                            fg='white',
+                            relief='flat',
+                            activebackground='#555555',
+                            activeforeground='white',
+                            font=("Roboto", 14),
+                            bd=0,
+                            highlightthickness=0)
+            btn.pack(fill=tk.X, pady=(0, 2))
+
+    def recall_preset(self, name):
+        routes = 0
+        for decoder_index, source in sorted(self.presets.get(name, {}).items()):
+            if not 0 <= decoder_index < len(self.decoders):
+                self.admin_panel.add_log(f"Preset '{name}': NDIDecoder{decoder_index + 1} is not configured", logging.WARNING)
+                continue
+            if source not in self.registry:
+                self.admin_panel.add_log(f"Preset '{name}': '{source}' is not a configured source", logging.WARNING)
+            routes += 1
+
+        if not routes:
+            return
+        if self.async_runner is None:
+            self.admin_panel.add_log("Still starting up; try again in a moment", logging.WARNING)
+            return
+        self.admin_panel.add_log(f"Recalling preset '{name}' on {routes} decoders")
+        self.async_runner.submit(self.core.recall_preset(name),
+                                 lambda results: self.on_preset_result(name, results))
+
+    def on_preset_result(self, name, results):
+        switched = 0
+        for decoder_index, source, result in results:
+            if decoder_index >= len(self.decoders):
+                continue
+            decoder_name = self.decoders[decoder_index].get('name', f"Decoder {decoder_index + 1}")
+            if result.ok:
+                switched += 1
+                self.admin_panel.add_log(f"Preset '{name}': {decoder_name} switched to {source}",
+                                         preset=name, decoder=decoder_name, source=source)
+                self.decoder_poller.kick(decoder_index)
+                if decoder_index == self.current_decoder_index and source in self.registry:
+                    self.config_manager.set('NDI_Sources', 'active_source', source)
+                self.on_decoder_channel(decoder_index, source)
+            else:
+                reason = result.error or f"status code {result.status_code}, response {result.text}"
+                self.admin_panel.add_log(f"Preset '{name}': {decoder_name} failed ({reason})", logging.WARNING,
+                                         preset=name, decoder=decoder_name, source=source)
+        self.admin_panel.add_log(f"Preset '{name}': {switched}/{len(results)} decoders switched")
 
     def select_decoder(self, index):
+        previous = self.current_decoder_index
         self.current_decoder_index = index
         self.set_decoder(index)
-        self.config['Settings']['last_decoder'] = str(index)
-        self.save_config()
-        self.create_decoder_selection()  # Refresh decoder selection buttons
-        self.login()  # Re-login with new decoder
-        self.create_buttons()  # Recreate source buttons
+        self.config_manager.set('Settings', 'last_decoder', str(index))
+        self.refresh_decoder_button(previous)
+        self.refresh_decoder_button(index)
+        # Show what this decoder last reported instead of the previous decoder's source
+        _, channel = self.decoder_states.get(index, (True, None))
+        channel = self.switch_targets.get(index, (None, channel))[1]  # A tap still in flight shows as made
+        if channel:
+            self.set_active_source(channel)
+        # No login here: the decoder's cached session is reused, and it logs in
+        # lazily on the first request if it never did
+        self.create_buttons()  # No-op unless the source grid was never built
         self.update_buttons()
+        self.update_reachable_sources()
         self.update_active_source_label()  # Update the active source label
 
     def set_decoder(self, index):
@@ -426,184 +743,329 @@ class NDIDecoderControl:
             self.password = ''
 
     def login(self):
+        # Logs in to every configured decoder concurrently. Decoders that still
+        # hold a valid session are skipped, so this is cheap to call again.
         if not self.decoder_ip:
-            self.admin_panel.add_log("No decoder IP set. Please add a decoder in the admin panel.")
-            return False
-        
-        url = f"http://{self.decoder_ip}/mwapi"
-        md5_password = hashlib.md5(self.password.encode()).hexdigest()
-        params = {
-            "method": "login",
-            "id": self.username,
-            "pass": md5_password
-        }
-        try:
-            response = self.session.get(url, params=params)
-            self.admin_panel.add_log(f"Request URL: {response.url}")
-            self.admin_panel.add_log(f"Response Status Code: {response.status_code}")
-            self.admin_panel.add_log(f"Response Content: {response.text}")
-            if response.status_code == 200 and response.json().get("status") == 0:
-                sid = response.cookies.get('sid')
-                if sid:
-                    self.session.cookies.set('sid', sid)
-                    self.admin_panel.add_log("Successfully logged in")
-                    return True
-                else:
-                    self.admin_panel.add_log("Login failed: Session ID not found in cookies")
-                    return False
-            else:
-                self.admin_panel.add_log(f"Login failed. Status code: {response.status_code}")
-                self.admin_panel.add_log(f"Response content: {response.text}")
-                return False
-        except requests.exceptions.RequestException as e:
-            self.admin_panel.add_log(f"Login error occurred: {e}")
-            return False
+            self.admin_panel.add_log("No decoder IP set. Please add a decoder in the admin panel.", logging.WARNING)
+
+        indexes = [i for i, decoder in enumerate(self.decoders) if decoder['ip']]
+        if indexes and self.async_runner is not None:
+            decoders = [dict(self.decoders[i]) for i in indexes]
+            self.async_runner.submit(self.decoder_manager.login_all(decoders),
+                                     lambda results: self.on_login_all_result(indexes, results))
+        return bool(self.decoder_ip)
+
+    def on_login_all_result(self, indexes, results):
+        for decoder_index, result in zip(indexes, results):
+            self.on_login_result(decoder_index, result)
+
+    def on_login_result(self, decoder_index, result):
+        if result.ok and decoder_index == self.current_decoder_index and self.source_grid is None:
+            self.create_buttons()
+            self.update_buttons()
+        if result.ok and result.status_code is None:
+            return  # Session was already cached, nothing was sent
+        if result.error and result.status_code is None:
+            self.admin_panel.add_log(f"Login error occurred: {result.error}", logging.WARNING, url=result.url)
+            return
+        self.log_response(result)
+        if result.ok:
+            self.admin_panel.add_log("Successfully logged in")
+        elif result.error:
+            self.admin_panel.add_log(f"Login failed: {result.error}", logging.WARNING, url=result.url)
+        else:
+            self.admin_panel.add_log(f"Login failed. Status code: {result.status_code}", logging.WARNING,
+                                     url=result.url, status=result.status_code)
+            self.admin_panel.add_log(f"Response content: {result.text}", logging.DEBUG)
+
+    def log_response(self, result):
+        # Response bodies are DEBUG so they can be left out of the log
+        self.admin_panel.add_log(f"Request URL: {result.url}", url=result.url)
+        self.admin_panel.add_log(f"Response Status Code: {result.status_code}", url=result.url, status=result.status_code)
+        self.admin_panel.add_log(f"Response Content: {result.text}", logging.DEBUG, url=result.url, body=result.text)
 
     def create_buttons(self):
-        self.buttons = []
+        with metrics.span('ui_create_buttons'):
+            self.build_source_grid()
+
+    def build_source_grid(self):
         font_size = 20
         background_color = '#1c1c1e'  # Dark gray (modern Tesla-like background)
+        select_source_text = self.model.message('select_source', 'Select Source')
 
-        num_sources = len(self.sources)
-        num_cols = math.ceil(math.sqrt(num_sources))
-        num_rows = math.ceil(num_sources / num_cols)
+        if self.source_grid is None:
+            # Set background color of button_frame
+            self.button_frame.configure(bg=background_color)
 
-        # Set background color of button_frame
-        self.button_frame.configure(bg=background_color)
+            # Add "Select Source" label at the top of button_frame
+            self.select_source_label = tk.Label(self.button_frame, text=select_source_text, bg='#1c1c1e', fg='white', font=("Roboto", 24), anchor='w')
+            self.select_source_label.pack(pady=(0, 2), fill=tk.X)
 
-        # Clear existing widgets in button_frame
-        for widget in self.button_frame.winfo_children():
-            widget.destroy()
+            # Add white line below "Select Source" spanning the window width
+            white_line = tk.Frame(self.button_frame, bg='white', height=1)
+            white_line.pack(fill=tk.X, pady=(0, 10))
 
-        # Add "Select Source" label at the top of button_frame
-        select_source_text = self.config['Messages'].get('select_source', 'Select Source')
-        select_source_label = tk.Label(self.button_frame, text=select_source_text, bg='#1c1c1e', fg='white', font=("Roboto", 24), anchor='w')
-        select_source_label.pack(pady=(0, 2), fill=tk.X)
-
-        # Add white line below "Select Source" spanning the window width
-        white_line = tk.Frame(self.button_frame, bg='white', height=1)
-        white_line.pack(fill=tk.X, pady=(0, 10))
-
-        # Create a frame for the source buttons
-        source_buttons_frame = tk.Frame(self.button_frame, bg=background_color)
-        source_buttons_frame.pack(expand=True, fill='both')
-
-        for i in range(num_rows):
-            source_buttons_frame.grid_rowconfigure(i, weight=1)
-        for j in range(num_cols):
-            source_buttons_frame.grid_columnconfigure(j, weight=1)
-
-        for i in range(num_rows):
-            row_buttons = []
-            for j in range(num_cols):
-                index = i * num_cols + j
-                if index < num_sources:
-                    btn = tk.Button(source_buttons_frame, text=self.user_friendly_names[index], 
-                                    command=lambda x=self.sources[index]: self.change_source(x),
-                                    bg='#333333' if self.sources[index] != self.active_source else '#3b3b3d',
-                                    fg='white', relief='flat',
-                                    activebackground='#555555',
-                                    activeforeground='white',
-                                    font=("Roboto", font_size))
-                    btn.grid(row=i, column=j, sticky="nsew", padx=5, pady=5)
-                    row_buttons.append(btn)
-            self.buttons.append(row_buttons)
-
-        # Update the button_frame size
-        self.button_frame.update_idletasks()
-        self.canvas.itemconfig(self.button_frame_window, width=self.content_frame.winfo_width() - 40, height=self.content_frame.winfo_height() - 150)
+            # The grid keeps its buttons and only reconfigures them when sources change
+            self.source_grid = SourceGrid(self.button_frame, self.change_source, bg=background_color, font_size=font_size,
+                                          on_visible=self.on_visible_sources)
+            self.source_grid.pack(expand=True, fill='both')
+        else:
+            self.select_source_label.config(text=select_source_text)
+
+        self.source_grid.set_sources(self.registry)
+        self.update_reachable_sources()
+        self.update_button_frame_size()
 
     def update_buttons(self):
-        for row in self.buttons:
-            for btn in row:
-                source = btn.cget('text')
-                if source == self.active_source_name:
-                    btn.config(bg='#3b3b3d')  # Slightly lighter background for active button
-                else:
-                    btn.config(bg='#333333')  # Reset other buttons
+        if self.source_grid is not None:
+            self.source_grid.set_active(self.active_source)
 
     def change_source(self, source):
-        url = f"http://{self.decoder_ip}/mwapi"
-        params = {
-            "method": "set-channel",
-            "ndi-name": "true",
-            "name": source
-        }
-        try:
-            response = self.session.get(url, params=params)
-            self.admin_panel.add_log(f"Request URL: {response.url}")
-            self.admin_panel.add_log(f"Response Status Code: {response.status_code}")
-            self.admin_panel.add_log(f"Response Content: {response.text}")
-            if response.status_code == 200 and response.json().get("status") == 0:
-                self.admin_panel.add_log(f"Successfully changed source to: {source}")
-                self.active_source = source
-                self.active_source_name = self.user_friendly_names[self.sources.index(source)]
-                self.config['NDI_Sources']['active_source'] = source
-                with open('config.ini', 'w') as configfile:
-                    self.config.write(configfile)
-                self.update_active_source_label()
-                self.update_buttons()
+        if not self.decoder_ip:
+            self.admin_panel.add_log("No decoder IP set. Please add a decoder in the admin panel.", logging.WARNING)
+            return
+        if self.async_runner is None:
+            self.admin_panel.add_log("Still starting up; try again in a moment", logging.WARNING)
+            return
+
+        decoder_index = self.current_decoder_index
+        if decoder_index not in self.switch_targets:
+            self.switch_fallbacks[decoder_index] = self.active_source
+        self.switch_seq += 1
+        seq = self.switch_seq
+        self.switch_targets[decoder_index] = (seq, source)
+        with metrics.span('ui_apply_switch'):
+            self.set_active_source(source)
+        # Taps made while this one is in flight collapse in the core; only
+        # the latest is sent next
+        self.async_runner.submit(self.core.switch(decoder_index, source),
+                                 lambda result: self.on_change_source_result(decoder_index, seq, source, result))
+
+    def on_change_source_result(self, decoder_index, seq, source, result):
+        from decoder_core import SUPERSEDED  # Already loaded by import_backend
+        pending = self.switch_targets.get(decoder_index)
+        latest = pending is not None and pending[0] == seq
+        if latest:
+            del self.switch_targets[decoder_index]
+        elif result.ok and pending is not None:
+            self.switch_fallbacks[decoder_index] = source  # A later tap is still on its way
+        # The rollback target only matters while a tap is pending
+        fallback = None
+        if decoder_index not in self.switch_targets:
+            fallback = self.switch_fallbacks.pop(decoder_index, None)
+
+        if result.error == SUPERSEDED:
+            # A later switch took its place before it was sent; if that came
+            # from another panel, show what the decoder is left on
+            if latest and fallback and decoder_index == self.current_decoder_index:
+                self.set_active_source(fallback)
+            return
+
+        if not result.ok:
+            if result.error and result.status_code is None:
+                self.admin_panel.add_log(f"Error occurred: {result.error}", logging.WARNING, url=result.url, source=source)
             else:
-                self.admin_panel.add_log(f"Failed to change source. Status code: {response.status_code}")
-                self.admin_panel.add_log(f"Response content: {response.text}")
-        except requests.exceptions.RequestException as e:
-            self.admin_panel.add_log(f"Error occurred: {e}")
+                self.log_response(result)
+                self.admin_panel.add_log(f"Failed to change source. Status code: {result.status_code}", logging.WARNING,
+                                         url=result.url, status=result.status_code, source=source)
+                self.admin_panel.add_log(f"Response content: {result.text}", logging.DEBUG)
+            # Move the highlight back to what the decoder is still showing
+            if latest and fallback and decoder_index == self.current_decoder_index:
+                self.set_active_source(fallback)
+            return
+
+        self.log_response(result)
+        self.admin_panel.add_log(f"Successfully changed source to: {source}", source=source)
+        self.decoder_poller.kick(decoder_index)
+        # The highlight moved on the tap; only the latest switch is saved
+        if latest and decoder_index == self.current_decoder_index:
+            self.config_manager.set('NDI_Sources', 'active_source', source)
+
+    def on_decoder_channel(self, decoder_index, source):
+        # A channel the decoder reported or another panel set. While a tap on
+        # this decoder is in flight the tap keeps the highlight, and this
+        # becomes what a failed tap rolls back to.
+        if decoder_index in self.switch_targets:
+            self.switch_fallbacks[decoder_index] = source
+        elif decoder_index == self.current_decoder_index:
+            self.set_active_source(source)
+
+    def set_active_source(self, source):
+        # Returns False when nothing changed, so no widget is touched
+        if source == self.active_source:
+            return False
+        self.active_source = source
+        self.active_source_name = self.source_name(source)
+        self.update_active_source_label()
+        self.update_buttons()
+        return True
+
+    def on_decoder_state(self, decoder_index, online, channel):
+        previous_online, _ = self.decoder_states.get(decoder_index, (True, None))
+        self.decoder_states[decoder_index] = (online, channel)
+        self.async_runner.call(lambda: self.core.update_state(decoder_index, online=online, channel=channel))
+        self.schedule_snapshot()
+
+        if online != previous_online and decoder_index < len(self.decoders):
+            self.refresh_decoder_button(decoder_index)
+            self.admin_panel.add_log(f"{self.decoders[decoder_index].get('name')} is {'online' if online else 'not responding'}",
+                                     logging.INFO if online else logging.WARNING, decoder=self.decoders[decoder_index].get('name'))
+
+        if channel:
+            self.on_decoder_channel(decoder_index, channel)
+
+    def on_decoder_sources(self, decoder_index, names):
+        previous = self.decoder_sources.get(decoder_index)
+        self.decoder_sources[decoder_index] = names
+        visible = sorted(names) if names is not None else None
+        self.async_runner.call(lambda: self.core.update_state(decoder_index, sources=visible))
+        self.schedule_snapshot()
+        if names is not None and previous is not None and decoder_index < len(self.decoders):
+            decoder_name = self.decoders[decoder_index].get('name')
+            for source in self.registry:
+                if source.ndi_name in previous and source.ndi_name not in names:
+                    self.admin_panel.add_log(f"{source.name} is no longer visible to {decoder_name}",
+                                             logging.WARNING, decoder=decoder_name, source=source.ndi_name)
+                elif source.ndi_name in names and source.ndi_name not in previous:
+                    self.admin_panel.add_log(f"{source.name} is visible to {decoder_name} again",
+                                             decoder=decoder_name, source=source.ndi_name)
+        if decoder_index == self.current_decoder_index:
+            self.update_reachable_sources()
+
+    def update_reachable_sources(self):
+        if self.source_grid is not None:
+            self.source_grid.set_reachable(self.decoder_sources.get(self.current_decoder_index))
 
     def show_main_interface(self):
         self.admin_panel.pack_forget()
         self.update_from_admin_panel()
         self.main_frame.pack(fill=tk.BOTH, expand=True)
-        self.create_decoder_selection()  # Recreate decoder selection buttons
         # Reset the admin tap counter
         self.admin_tap_count = 0
         self.last_tap_time = 0
 
     def update_from_admin_panel(self):
-        # Re-read the configuration
-        self.config.read('config.ini')
-        
-        # Update sources and user-friendly names
-        self.sources = [value for key, value in self.config['NDI_Sources'].items() if key.startswith('source')]
-        self.user_friendly_names = [value for key, value in self.config['User_Friendly_Names'].items() if key.startswith('source')]
-        self.active_source = self.config['NDI_Sources'].get('active_source', self.sources[0])
-        self.active_source_name = self.user_friendly_names[self.sources.index(self.active_source)]
-
-        # Update decoders
-        self.decoders = []
-        for section in self.config.sections():
-            if section.startswith('NDIDecoder'):
-                decoder = {
-                    'ip': self.config[section].get('ip', ''),
-                    'username': self.config[section].get('username', ''),
-                    'password': self.config[section].get('password', ''),
-                    'name': self.config[section].get('name', f"Decoder {len(self.decoders) + 1}")
-                }
-                self.decoders.append(decoder)
-
-        # Update welcome message
-        self.welcome_message = self.config['Messages'].get('welcome', 'Welcome to NDI Decoder Control!')
-        self.canvas.itemconfig(self.welcome_label, text=self.welcome_message)
-
-        # Update active source label
+        # Re-read the configuration and refresh only what changed
+        self.config_manager.load_config()
+        model = AppConfig.from_parser(self.config)
+        changes = self.model.diff(model)
+        self.model = model
+        for event_type, payload in changes:
+            self.event_system.dispatch_event(event_type, payload)
+
+    def source_name(self, source):
+        return self.registry.name(source)
+
+    def apply_sources(self, sources):
+        # One registry serves the grid, the admin panel and the core
+        self.registry = SourceRegistry(sources)
+
+    def on_sources_changed(self, sources):
+        self.apply_sources(sources)
+        if self.core is not None:
+            self.configure_core()
+        self.active_source_name = self.source_name(self.active_source)
+        if self.source_grid is not None:
+            self.create_buttons()
+            self.update_buttons()
         self.update_active_source_label()
 
-        # Update buttons
-        self.create_buttons()
-        self.update_buttons()
+    def on_active_source_changed(self, source):
+        self.set_active_source(source)
+
+    def on_decoders_changed(self, changed_indexes):
+        self.decoders = [decoder.as_dict() for decoder in self.model.decoders]
+        if self.decoders:
+            self.current_decoder_index = min(max(self.current_decoder_index, 0), len(self.decoders) - 1)
+        self.set_decoder(self.current_decoder_index)
+
+        # Drop sessions of removed or edited decoders and log in to new ones;
+        # unchanged decoders keep their session and poller
+        for index in changed_indexes:
+            self.decoder_states.pop(index, None)
+            self.decoder_sources.pop(index, None)
+        # Sessions of removed decoders are closed along with their breakers
+        ips = {decoder['ip'] for decoder in self.decoders}
+        self.breaker_states = {ip: state for ip, state in self.breaker_states.items() if ip in ips}
+        # Before finish_backend() has run there is nothing to update; it picks
+        # up the new list itself
+        if self.async_runner is not None:
+            self.configure_core()
+            decoders = [dict(decoder) for decoder in self.decoders]
+            self.async_runner.submit(self.decoder_manager.prune(decoders))
+            self.login()
+            self.decoder_poller.start(self.decoders)
+            self.source_discovery.start(self.decoders)
+        self.update_reachable_sources()
+
+        # The decoder column is only shown when there is something to pick
+        if len(self.decoders) > 1:
+            self.content_frame.pack_forget()
+            self.decoder_selection_frame.pack(side=tk.LEFT, fill=tk.Y)
+            self.content_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        else:
+            self.decoder_selection_frame.pack_forget()
+        self.create_decoder_selection()
+        if self.decoders:
+            self.update_active_source_label()
 
-        # Refresh decoder selection buttons
+    def on_messages_changed(self, keys):
+        if 'welcome' in keys:
+            self.welcome_message = self.model.message('welcome', DEFAULT_WELCOME)
+            self.canvas.itemconfig(self.welcome_label, text=self.welcome_message)
+        if 'select_source' in keys and self.source_grid is not None:
+            self.create_buttons()
+        if 'select_decoder' in keys or 'presets' in keys:
+            self.create_decoder_selection()
+
+    def start_previews(self):
+        # Preview thumbnails on the source buttons, off unless [Previews] url is set
+        from source_previews import PreviewFetcher, PreviewOptions
+        if self.preview_fetcher is not None:
+            self.preview_fetcher.stop()
+            self.preview_fetcher = None
+        try:
+            options = PreviewOptions(self.model.previews)
+        except ValueError as e:
+            self.admin_panel.add_log(f"Previews are off: invalid [Previews] setting ({e})", logging.WARNING)
+            options = None
+        if options is None or not options.url:
+            if self.source_grid is not None:
+                self.source_grid.set_thumbnails(None)
+            return
+        self.preview_fetcher = PreviewFetcher(self.async_runner, self.on_preview, options)
+        if self.source_grid is not None:
+            self.source_grid.set_thumbnails(ThumbnailCache(options.max_bytes), options.size[1])
+            self.preview_fetcher.show(self.source_grid.visible)
+
+    def on_visible_sources(self, sources):
+        if self.preview_fetcher is not None:
+            self.preview_fetcher.show(sources)
+
+    def on_preview(self, source, data):
+        if self.source_grid is not None:
+            self.source_grid.set_preview(source, data)
+
+    def on_previews_changed(self, previews):
+        if self.async_runner is not None:
+            self.start_previews()
+
+    def on_presets_changed(self, presets):
+        self.presets = presets
+        if self.core is not None:
+            self.configure_core()
         self.create_decoder_selection()
 
     def update_decoders(self):
         # Update the config file with the new decoder information
         for i, decoder in enumerate(self.decoders, 1):
             section = f'NDIDecoder{i}'
-            if not self.config.has_section(section):
-                self.config.add_section(section)
-            self.config[section]['ip'] = decoder['ip']
-            self.config[section]['username'] = decoder['username']
-            self.config[section]['password'] = decoder['password']
-            self.config[section]['name'] = decoder['name']
+            self.config_manager.add_section(section, {
+                'ip': decoder['ip'],
+                'username': decoder['username'],
+                'password': decoder['password'],
+                'name': decoder['name']
+            })
         
         # Remove any excess decoder sections
         sections_to_remove = []
@@ -618,21 +1080,62 @@ class NDIDecoderControl:
                     sections_to_remove.append(section)
         
         for section in sections_to_remove:
-            self.config.remove_section(section)
+            self.config_manager.remove_section(section)
         
-        self.save_config()
         if self.decoders:
             self.current_decoder_index = min(self.current_decoder_index, len(self.decoders) - 1)
         else:
             self.current_decoder_index = -1  # No decoders available
-        self.config['Settings']['last_decoder'] = str(self.current_decoder_index)
-        self.save_config()
+        self.config_manager.set('Settings', 'last_decoder', str(self.current_decoder_index))
         self.set_decoder(self.current_decoder_index)
         self.create_decoder_selection()  # Refresh decoder selection buttons
 
     def save_config(self):
-        with open('config.ini', 'w') as configfile:
-            self.config.write(configfile)
+        self.config_manager.save_config()
+
+    def update_sources(self, new_sources):
+        self.write_source_list('NDI_Sources', new_sources)
+
+    def update_button_names(self, new_names):
+        self.write_source_list('User_Friendly_Names', new_names)
+
+    def write_source_list(self, section, values):
+        # Rewrites the sourceN keys and keeps others such as active_source;
+        # the UI picks the change up when the admin panel closes
+        for key in [key for key in self.config[section] if key.startswith('source')]:
+            self.config_manager.remove_option(section, key)
+        for i, value in enumerate(values, 1):
+            if value:
+                self.config_manager.set(section, f'source{i}', value)
+
+    def cleanup(self):
+        # Called from close_app and again when the main loop exits
+        if getattr(self, 'closed', False):
+            return
+        self.closed = True
+        if self.snapshot_job is not None:
+            self.master.after_cancel(self.snapshot_job)
+        self.write_snapshot()
+        if self.async_runner is not None:
+            self.decoder_poller.stop()
+            self.source_discovery.stop()
+            if self.preview_fetcher is not None:
+                self.preview_fetcher.stop()
+            if self.control_api is not None:
+                self.async_runner.submit(self.control_api.stop())
+            future = self.async_runner.submit(self.decoder_manager.close())
+            try:
+                future.result(timeout=2)
+            except Exception as e:
+                print(f"Error closing decoder sessions: {e}")
+            self.async_runner.stop()
+        if self.journal is not None:
+            self.journal.close()
+        self.event_system.detach_tk()
+        self.config_manager.flush()
+        self.log_listener.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
 
     def on_active_source_tap(self, event):
         current_time = time.time()
@@ -656,24 +1159,19 @@ class NDIDecoderControl:
         self.canvas.itemconfig(self.active_source_label, text=f"Active Source: {self.active_source_name} on {decoder_name}")
 
     def update_button_frame_size(self, event=None):
+        # <Configure> arrives in bursts while the window settles; resize once
+        # per frame and let the grid weights stretch the existing buttons
+        if self.resize_job is None:
+            self.resize_job = self.master.after(FRAME_MS, self.resize_button_frame)
+
+    def resize_button_frame(self):
+        self.resize_job = None
         self.canvas.itemconfig(self.button_frame_window, width=self.content_frame.winfo_width() - 40, height=self.content_frame.winfo_height() - 150)
-        self.create_buttons()  # Recreate buttons to fit the new size
-
-# Update the config.ini file to include a Settings section
-def update_config_file():
-    config = configparser.ConfigParser()
-    config.read('config.ini')
-    
-    if 'Settings' not in config:
-        config['Settings'] = {'last_decoder': '0'}
-    
-    with open('config.ini', 'w') as configfile:
-        config.write(configfile)
-
-# Call this function before creating the NDIDecoderControl instance
-update_config_file()
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = NDIDecoderControl(root)
-    root.mainloop()
\ No newline at end of file
+    try:
+        root.mainloop()
+    finally:
+        app.cleanup()
\ No newline at end of file
@@ -0,0 +1,46 @@
+import time
+from decoder_manager import find_source_names
+from decoder_tasks import DecoderTasks
+
+# Seconds a decoder's source list stays valid. Each decoder is refreshed on
+# its own schedule shortly before its entry expires.
+DEFAULT_TTL = 30
+# Seconds before retrying a decoder whose list could not be fetched
+RETRY_INTERVAL = 5
+
+class SourceDiscovery(DecoderTasks):
+    # Keeps a per-decoder cache of the NDI sources each decoder can see,
+    # refreshed in the background on the AsyncRunner loop.
+    # on_change(decoder_index, names) runs on the Tk thread whenever a
+    # decoder's list changes; names is a frozenset, or None once the cached
+    # list has expired without a successful refresh (reachability unknown).
+    def __init__(self, decoder_manager, async_runner, on_change, ttl=DEFAULT_TTL):
+        super().__init__(decoder_manager, async_runner, on_change)
+        self.ttl = ttl
+        self.cache = {}  # decoder_index -> (expires_at, names)
+
+    def refresh(self, decoder_index):
+        # Fetches right away instead of waiting for the entry to expire
+        self.kick(decoder_index)
+
+    def forget(self, index):
+        self.cache.pop(index, None)
+
+    async def run(self, index, decoder, wakeup):
+        while True:
+            result = await self.decoder_manager.get_ndi_sources(decoder)
+            names = find_source_names(result.data) if result.ok else None
+            now = time.monotonic()
+            previous = self.cache.get(index)
+            delay = min(RETRY_INTERVAL, self.ttl)
+            if names is not None:
+                self.cache[index] = (now + self.ttl, names)
+                delay = self.ttl * 0.8
+            elif previous is not None and now < previous[0]:
+                names = previous[1]  # Keep the last good list until it expires
+            else:
+                self.cache[index] = (now, None)
+            if previous is None or names != previous[1]:
+                self.async_runner.post(self.on_change, index, names)
+
+            await self.wait(wakeup, delay)
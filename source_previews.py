@@ -0,0 +1,107 @@
+import asyncio
+import base64
+import io
+import time
+import urllib.parse
+import aiohttp
+from metrics import metrics
+
+# Seconds between refreshes of a source's preview; [Previews] sourceN = seconds
+# overrides it for one source
+DEFAULT_REFRESH = 10
+DEFAULT_SIZE = (160, 90)
+DEFAULT_CACHE_MB = 8
+FETCH_TIMEOUT = 5
+# Stills fetched at once, so a screenful of previews cannot crowd out switches
+MAX_CONCURRENT_FETCHES = 4
+
+class PreviewOptions:
+    # [Previews] section. Previews are off unless url is set; {source} is
+    # replaced by the URL-quoted NDI name and {slot} by its sourceN key, e.g.
+    #   url = http://snapshots.local/still?name={source}
+    def __init__(self, previews):
+        self.url = previews.get('url', '').strip()
+        self.refresh = float(previews.get('refresh', DEFAULT_REFRESH))
+        self.intervals = {key: float(value) for key, value in previews.items()
+                          if key.startswith('source') and value.strip()}
+        self.size = (int(previews.get('width', DEFAULT_SIZE[0])), int(previews.get('height', DEFAULT_SIZE[1])))
+        self.max_bytes = int(float(previews.get('cache_mb', DEFAULT_CACHE_MB)) * 1024 * 1024)
+
+class PreviewFetcher:
+    # Keeps the previews of the sources on screen fresh. Fetches run on the
+    # AsyncRunner loop and decoding on a worker thread; on_preview(ndi_name,
+    # png) gets a base64 PNG on the Tk thread. Sources that scroll out of
+    # view stop being fetched, and ones that come back wait out the rest of
+    # their interval.
+    def __init__(self, async_runner, on_preview, options):
+        self.async_runner = async_runner
+        self.on_preview = on_preview
+        self.options = options
+        self.tasks = {}  # ndi_name -> task
+        self.fetched_at = {}  # ndi_name -> monotonic time of the last attempt
+        self.session = None
+        self.limit = None
+
+    def show(self, sources):
+        # The registry entries now on screen; safe to call from Tk
+        self.async_runner.call(self.update, list(sources))
+
+    def stop(self):
+        return self.async_runner.submit(self.close())
+
+    def update(self, sources):
+        wanted = {source.ndi_name: source for source in sources}
+        for name in list(self.tasks):
+            if name not in wanted:
+                self.tasks.pop(name).cancel()
+        for name, source in wanted.items():
+            if name not in self.tasks:
+                self.tasks[name] = asyncio.create_task(self.watch(source))
+
+    async def watch(self, source):
+        interval = self.options.intervals.get(source.slot, self.options.refresh)
+        while True:
+            last = self.fetched_at.get(source.ndi_name)
+            if last is not None:
+                await asyncio.sleep(max(0, last + interval - time.monotonic()))
+            self.fetched_at[source.ndi_name] = time.monotonic()
+            await self.fetch(source)
+
+    async def fetch(self, source):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=FETCH_TIMEOUT))
+            self.limit = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+        url = self.options.url.format(source=urllib.parse.quote(source.ndi_name, safe=''), slot=source.slot)
+        try:
+            with metrics.span('preview_fetch'):
+                async with self.limit:
+                    async with self.session.get(url) as response:
+                        response.raise_for_status()
+                        data = await response.read()
+                png = await asyncio.get_running_loop().run_in_executor(None, make_thumbnail, data, self.options.size)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return  # Counted as preview_fetch_errors_total; the old preview stays up
+        self.async_runner.post(self.on_preview, source.ndi_name, png)
+
+    async def close(self):
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+def make_thumbnail(data, size):
+    # Worker thread: decode, shrink to fit size and re-encode as a base64 PNG,
+    # which Tk loads without PIL's ImageTk
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image.draft('RGB', size)  # Lets the JPEG decoder skip most of a full-size still
+    image = image.convert('RGB')
+    image.thumbnail(size, Image.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', compress_level=1)
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
@@ -0,0 +1,58 @@
+class SourceRegistry:
+    # The configured sources in slot order, indexed by NDI name, friendly
+    # name, slot key and tag so lookups never scan a list. It is built once
+    # per config change and never modified, so the Tk thread and the asyncio
+    # loop can share one without locking.
+    def __init__(self, sources=()):
+        self.sources = tuple(sources)
+        self.positions = {}  # NDI name -> position; the first entry wins for duplicates
+        self.slots = {}
+        self.names = {}  # Friendly name -> [Source]; names need not be unique
+        self.tags = {}  # Tag -> [Source]
+        for position, source in enumerate(self.sources):
+            self.positions.setdefault(source.ndi_name, position)
+            self.slots[source.slot] = source
+            self.names.setdefault(source.name, []).append(source)
+            for tag in source.tags:
+                self.tags.setdefault(tag, []).append(source)
+
+    def __len__(self):
+        return len(self.sources)
+
+    def __iter__(self):
+        return iter(self.sources)
+
+    def __contains__(self, ndi_name):
+        return ndi_name in self.positions
+
+    def get(self, ndi_name):
+        position = self.positions.get(ndi_name)
+        return self.sources[position] if position is not None else None
+
+    def position(self, ndi_name):
+        return self.positions.get(ndi_name)
+
+    def name(self, ndi_name):
+        # Friendly name, or the NDI name for a source set outside this app
+        source = self.get(ndi_name)
+        return source.name if source is not None else ndi_name
+
+    def by_slot(self, slot):
+        return self.slots.get(slot)
+
+    def by_name(self, name):
+        return list(self.names.get(name, ()))
+
+    def tagged(self, tag):
+        return list(self.tags.get(tag, ()))
+
+    def ndi_names(self):
+        return [source.ndi_name for source in self.sources]
+
+    def friendly_names(self):
+        return [source.name for source in self.sources]
+
+    def as_list(self):
+        # What API clients see of the sources
+        return [{'source': source.ndi_name, 'name': source.name, 'tags': list(source.tags)}
+                for source in self.sources]
@@ -0,0 +1,31 @@
+import json
+import os
+
+# Small JSON file with what the UI last showed that config.ini does not hold:
+# each decoder's reported channel and health, the sources it could see, and
+# how long the last start took. It lets a cold start paint the last-known
+# state before any decoder has answered.
+SNAPSHOT_VERSION = 1
+
+def load_snapshot(path):
+    try:
+        with open(path, encoding='utf-8') as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Ignoring startup snapshot {path}: {e}")
+        return {}
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        return {}
+    return snapshot
+
+def save_snapshot(path, snapshot):
+    snapshot = dict(snapshot, version=SNAPSHOT_VERSION)
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error saving startup snapshot {path}: {e}")
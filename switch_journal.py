@@ -0,0 +1,192 @@
+import argparse
+import datetime
+import os
+import queue
+import sqlite3
+import threading
+import time
+from metrics import metrics
+
+DEFAULT_JOURNAL_PATH = 'switch_journal.db'
+# Rows wait this many seconds for company before a batch is committed
+BATCH_DELAY = 0.5
+MAX_BATCH = 500
+# Rows held for the writer before new ones are dropped (and counted)
+MAX_PENDING = 10000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    decoder TEXT,
+    ip TEXT,
+    source TEXT,
+    ok INTEGER NOT NULL,
+    latency REAL,
+    origin TEXT,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS journal_ts ON journal (ts);
+CREATE INDEX IF NOT EXISTS journal_switches ON journal (decoder, ts) WHERE kind = 'switch' AND ok = 1;
+'''
+
+INSERT = ('INSERT INTO journal (ts, kind, decoder, ip, source, ok, latency, origin, detail) '
+          'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)')
+
+class SwitchJournal:
+    # Append-only record of switches, logins and breaker changes in SQLite
+    # (WAL mode). record() only queues a row, so it is safe and cheap on the
+    # asyncio loop; a writer thread commits rows in batches. Queries open
+    # their own connection and can run from any thread while writes go on.
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self.queue = queue.Queue(MAX_PENDING)
+        connection = self.connect()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        connection.close()
+        self.thread = threading.Thread(target=self.write_rows, name="switch-journal", daemon=True)
+        self.thread.start()
+
+    def connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA synchronous=NORMAL')  # WAL stays consistent; a crash may lose the last batch
+        return connection
+
+    def record(self, kind, decoder, source=None, result=None, latency=None, origin=None, detail=None, ok=None):
+        # decoder is a decoder dict (name and ip are kept); result an MwapiResult
+        if ok is None:
+            ok = result.ok if result is not None else True
+        if detail is None and result is not None and not result.ok:
+            detail = result.error or f"status code {result.status_code}: {result.text}"
+        row = (time.time(), kind, decoder.get('name'), decoder.get('ip'), source, int(ok), latency, origin, detail)
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            metrics.inc('journal_dropped_total')
+
+    def write_rows(self):
+        connection = self.connect()
+        stopping = False
+        while not stopping:
+            rows = [self.queue.get()]
+            deadline = time.monotonic() + BATCH_DELAY
+            while rows[-1] is not None and len(rows) < MAX_BATCH:
+                try:
+                    rows.append(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if rows[-1] is None:
+                stopping = True
+                rows.pop()
+            if not rows:
+                continue
+            try:
+                with metrics.span('journal_write'):
+                    connection.executemany(INSERT, rows)
+                    connection.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing {len(rows)} rows to {self.path}: {e}")
+        connection.close()
+
+    def close(self, timeout=2):
+        # Commits what is queued and stops the writer
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def query(self, sql, params=()):
+        connection = self.connect()
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def source_at(self, decoder, when):
+        # What decoder (by name) was last switched to at or before when
+        # (epoch seconds): (ts, source, origin), or None
+        rows = self.query("SELECT ts, source, origin FROM journal "
+                          "WHERE decoder = ? AND kind = 'switch' AND ok = 1 AND ts <= ? "
+                          "ORDER BY ts DESC LIMIT 1", (decoder, when))
+        return rows[0] if rows else None
+
+    def usage_counts(self, since=None, until=None, decoder=None):
+        # [(source, successful switches)], most used first
+        sql = "SELECT source, COUNT(*) FROM journal WHERE kind = 'switch' AND ok = 1"
+        params = []
+        for clause, value in (("ts >= ?", since), ("ts < ?", until), ("decoder = ?", decoder)):
+            if value is not None:
+                sql += f" AND {clause}"
+                params.append(value)
+        return self.query(sql + " GROUP BY source ORDER BY COUNT(*) DESC, source", params)
+
+    def history(self, since=None, limit=100):
+        # Newest entries first, as (ts, kind, decoder, source, ok, latency, origin, detail)
+        return self.query("SELECT ts, kind, decoder, source, ok, latency, origin, detail FROM journal "
+                          "WHERE ts >= ? ORDER BY ts DESC LIMIT ?", (since or 0, limit))
+
+class SwitchJournalReader(SwitchJournal):
+    # Queries only; no schema changes or writer thread, for the CLI
+    def __init__(self, path):
+        self.path = path
+
+def journal_path(settings, config_file):
+    # [Settings] journal_path, relative to config.ini; an empty value turns
+    # the journal off
+    path = settings.get('journal_path', DEFAULT_JOURNAL_PATH).strip()
+    if not path:
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(config_file)), path)
+
+def parse_time(text):
+    # "14:05" means today; otherwise an ISO date and time, or epoch seconds
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    if len(text) <= 8 and ':' in text:
+        moment = datetime.datetime.combine(datetime.date.today(), datetime.time.fromisoformat(text))
+    else:
+        moment = datetime.datetime.fromisoformat(text)
+    return moment.timestamp()
+
+def format_time(ts):
+    return datetime.datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the switch journal")
+    parser.add_argument("--journal", default=DEFAULT_JOURNAL_PATH, help="Journal file")
+    parser.add_argument("--decoder", help="Decoder name, e.g. 'Decoder 1'")
+    parser.add_argument("--at", help="Show what --decoder was on at this time (14:05, 2024-05-01T14:05)")
+    parser.add_argument("--usage", action="store_true", help="Count switches per source")
+    parser.add_argument("--since", help="Only count or list entries from this time on")
+    parser.add_argument("--until", help="Only count entries before this time")
+    parser.add_argument("--limit", type=int, default=20, help="Entries to list")
+    args = parser.parse_args()
+    if not os.path.exists(args.journal):
+        parser.error(f"{args.journal} does not exist")
+    journal = SwitchJournalReader(args.journal)
+
+    if args.at:
+        if not args.decoder:
+            parser.error("--at needs --decoder")
+        row = journal.source_at(args.decoder, parse_time(args.at))
+        if row is None:
+            print(f"No switches recorded for {args.decoder} before {args.at}")
+        else:
+            ts, source, origin = row
+            print(f"{args.decoder} was on {source} (switched {format_time(ts)} by {origin})")
+    elif args.usage:
+        since = parse_time(args.since) if args.since else None
+        until = parse_time(args.until) if args.until else None
+        for source, count in journal.usage_counts(since, until, args.decoder):
+            print(f"{count:6d}  {source}")
+    else:
+        since = parse_time(args.since) if args.since else None
+        for ts, kind, decoder, source, ok, latency, origin, detail in journal.history(since, args.limit):
+            took = f"{latency * 1000:.0f} ms" if latency is not None else ''
+            print(f"{format_time(ts)}  {kind:7s} {'ok ' if ok else 'ERR'} {decoder or '':12s} {source or '':30s} "
+                  f"{took:>8s}  {origin or ''}  {detail or ''}")
+
+if __name__ == "__main__":
+    main()
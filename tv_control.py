@@ -1,54 +1,280 @@
 import configparser
 import serial
+import threading
 import time
+import re
 import argparse
+from concurrent.futures import Future
+
+# Reply patterns for brands whose acknowledgement format is known. A TV entry
+# in [TVs] can add ack:<hex> / nak:<hex> to override these or to cover other
+# brands; without either, commands are sent without waiting for a reply.
+BRAND_REPLIES = {
+    'samsung': (rb'\xaa\xff..A', rb'\xaa\xff..N'),  # MDC: header, id, length, 'A'/'N'
+    'lg': (rb' OK', rb' NG'),  # e.g. "a 01 OK01x"
+}
+
+ACK_TIMEOUT = 1.0  # Seconds to wait for a reply
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.2  # Doubles per retry, capped at MAX_BACKOFF
+MAX_BACKOFF = 1.0
+# Seconds an acknowledged power state is trusted; after that the command is
+# sent again, since the TV may have been switched by its remote or lost power.
+# [TVs] state_ttl overrides it.
+DEFAULT_STATE_TTL = 300
+
+# Results of a power command
+ACKED = 'acked'  # TV confirmed the command
+SENT = 'sent'  # Written, but this brand has no known acknowledgement
+SKIPPED = 'skipped'  # TV already confirmed this power state
+FAILED = 'failed'
+
+# pyserial lets termios.error through from flush() and reset_input_buffer()
+# when a POSIX port goes away
+try:
+    import termios
+    PORT_ERRORS = (serial.SerialException, termios.error)
+except ImportError:
+    PORT_ERRORS = (serial.SerialException,)
+
+class SerialTransport:
+    # Keeps one serial port open between commands and reopens it after an
+    # error. serial_factory opens the port; check_serial_transport.py passes
+    # one backed by pty pairs.
+    def __init__(self, port, baud_rate, timeout=1, serial_factory=serial.Serial):
+        self.port = port
+        self.baud_rate = baud_rate
+        self.timeout = timeout
+        self.serial_factory = serial_factory
+        self.ser = None
+        self.lock = threading.Lock()
+
+    def open(self):
+        if self.ser is None or not self.ser.is_open:
+            self.ser = self.serial_factory(self.port, self.baud_rate, timeout=self.timeout,
+                                           write_timeout=self.timeout)
+        return self.ser
+
+    def send(self, command, retries=1):
+        with self.lock:
+            for attempt in range(retries + 1):
+                try:
+                    ser = self.open()
+                    ser.write(command)
+                    ser.flush()  # Returns once the bytes have left the port
+                    return
+                except PORT_ERRORS as e:
+                    # Cable pulled or adapter re-enumerated; reconnect and retry
+                    self.close_port()
+                    if attempt == retries:
+                        raise serial.SerialException(str(e)) from e
+
+    def request(self, command, ack_pattern, nak_pattern, timeout=ACK_TIMEOUT):
+        # Sends command and reads until the reply matches ack_pattern (True),
+        # nak_pattern (False) or the timeout passes (None)
+        with self.lock:
+            try:
+                ser = self.open()
+                ser.reset_input_buffer()  # Drop stale replies from earlier commands
+                ser.write(command)
+                ser.flush()
+                reply = b''
+                deadline = time.monotonic() + timeout
+                while time.monotonic() < deadline:
+                    reply += ser.read(ser.in_waiting or 1)
+                    if ack_pattern and re.search(ack_pattern, reply, re.DOTALL):
+                        return True
+                    if nak_pattern and re.search(nak_pattern, reply, re.DOTALL):
+                        return False
+                return None
+            except PORT_ERRORS as e:
+                self.close_port()
+                raise serial.SerialException(str(e)) from e
+
+    def close_port(self):
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except serial.SerialException:
+                pass
+            self.ser = None
+
+    def close(self):
+        with self.lock:
+            self.close_port()
+
+class PortScheduler:
+    # One worker thread per port. Power requests are queued per TV, and a new
+    # request for a TV that is still queued replaces the old one (on then off
+    # collapses to off). Requests that match the power state the TV confirmed
+    # within the last state_ttl seconds are skipped.
+    def __init__(self, transport, controller):
+        self.transport = transport
+        self.controller = controller
+        self.pending = {}  # tv_id -> (action, [futures]), in arrival order
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name=f"tv-port-{transport.port}", daemon=True)
+        self.thread.start()
+
+    def submit(self, tv_id, action, force=False):
+        future = Future()
+        with self.condition:
+            _, futures = self.pending.pop(tv_id, (None, []))
+            futures.append(future)
+            if not force and self.controller.power_state(tv_id) == action:
+                # Anything still queued for this TV is superseded as well
+                for waiting in futures:
+                    waiting.set_result(SKIPPED)
+                return future
+            self.pending[tv_id] = (action, futures)
+            self.condition.notify()
+        return future
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed and not self.pending:
+                    return
+                tv_id = next(iter(self.pending))
+                action, futures = self.pending.pop(tv_id)
+            result = self.execute(tv_id, action)
+            for future in futures:
+                future.set_result(result)
+
+    def execute(self, tv_id, action):
+        tv = self.controller.tvs[tv_id]
+        command = tv[f'{action}_cmd']
+        backoff = RETRY_BACKOFF
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                if not tv['ack'] and not tv['nak']:
+                    self.transport.send(command)
+                    print(f"Command sent to {tv['brand']} TV on {tv['port']}")
+                    return SENT
+                reply = self.transport.request(command, tv['ack'], tv['nak'])
+                if reply:
+                    self.controller.power_states[tv_id] = (action, time.monotonic())
+                    print(f"{tv['brand']} TV on {tv['port']} acknowledged {action}")
+                    return ACKED
+                print(f"{tv['brand']} TV on {tv['port']} {'rejected' if reply is False else 'did not answer'} {action}")
+            except serial.SerialException as e:
+                print(f"Error sending command to {tv['brand']} TV on {tv['port']}: {e}")
+            if attempt < MAX_RETRIES:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+        # The TV's state is unknown now, so the next request is always sent
+        self.controller.power_states.pop(tv_id, None)
+        return FAILED
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
 
 class TVController:
-    def __init__(self, config_file='config.ini'):
+    def __init__(self, config_file='config.ini', serial_factory=serial.Serial):
         self.config = configparser.ConfigParser()
         self.config.read(config_file)
+        self.state_ttl = float(self.config.get('TVs', 'state_ttl', fallback=DEFAULT_STATE_TTL))
         self.tvs = self.parse_tv_config()
+        self.serial_factory = serial_factory
+        # Last power state each TV acknowledged, as (action, monotonic time)
+        self.power_states = {}
+        # One transport and scheduler per port; TVs daisy-chained on a port share them
+        self.transports = {}
+        self.schedulers = {}
+        for tv in self.tvs.values():
+            self.get_transport(tv)
 
     def parse_tv_config(self):
         tvs = {}
         for key, value in self.config['TVs'].items():
-            port, baud_rate, brand, on_cmd, off_cmd = value.split(',')
+            if key == 'state_ttl':
+                continue
+            port, baud_rate, brand, on_cmd, off_cmd, *extra = [part.strip() for part in value.split(',')]
+            ack, nak = BRAND_REPLIES.get(brand.lower(), (None, None))
+            for option in extra:
+                name, _, hex_bytes = option.partition(':')
+                pattern = re.escape(bytes.fromhex(hex_bytes.replace(' ', '')))
+                if name == 'ack':
+                    ack = pattern
+                elif name == 'nak':
+                    nak = pattern
             tvs[key] = {
                 'port': port,
                 'baud_rate': int(baud_rate),
                 'brand': brand,
                 'on_cmd': bytes.fromhex(on_cmd.split(':')[1].replace(' ', '')),
-                'off_cmd': bytes.fromhex(off_cmd.split(':')[1].replace(' ', ''))
+                'off_cmd': bytes.fromhex(off_cmd.split(':')[1].replace(' ', '')),
+                'ack': ack,
+                'nak': nak
             }
         return tvs
 
+    def power_state(self, tv_id):
+        # 'on' or 'off' if the TV confirmed it within state_ttl seconds, else None
+        action, confirmed = self.power_states.get(tv_id, (None, 0))
+        if action is not None and time.monotonic() - confirmed > self.state_ttl:
+            return None
+        return action
+
+    def get_transport(self, tv):
+        if tv['port'] not in self.transports:
+            transport = SerialTransport(tv['port'], tv['baud_rate'], serial_factory=self.serial_factory)
+            self.transports[tv['port']] = transport
+            self.schedulers[tv['port']] = PortScheduler(transport, self)
+        return self.transports[tv['port']]
+
     def send_command(self, tv_id, command):
+        # Raw command, written as-is without coalescing or acknowledgement
         if tv_id not in self.tvs:
             print(f"TV {tv_id} not found in configuration.")
-            return
+            return False
 
         tv = self.tvs[tv_id]
         try:
-            with serial.Serial(tv['port'], tv['baud_rate'], timeout=1) as ser:
-                ser.write(command)
-                time.sleep(0.1)  # Wait for command to be sent
-                print(f"Command sent to {tv['brand']} TV on {tv['port']}")
+            self.get_transport(tv).send(command)
+            print(f"Command sent to {tv['brand']} TV on {tv['port']}")
+            return True
         except serial.SerialException as e:
             print(f"Error sending command to {tv['brand']} TV on {tv['port']}: {e}")
+            return False
+
+    def set_power(self, tv_id, action, force=False):
+        # Queues a power change and returns a Future with ACKED, SENT, SKIPPED or FAILED
+        if tv_id not in self.tvs:
+            print(f"TV {tv_id} not found in configuration.")
+            future = Future()
+            future.set_result(FAILED)
+            return future
+        return self.schedulers[self.tvs[tv_id]['port']].submit(tv_id, action, force)
+
+    def set_power_many(self, tv_ids, action, force=False):
+        # Ports work through their queues in parallel
+        futures = {tv_id: self.set_power(tv_id, action, force) for tv_id in tv_ids}
+        return {tv_id: future.result() for tv_id, future in futures.items()}
+
+    def turn_on_tv(self, tv_id, force=False):
+        return self.set_power(tv_id, 'on', force).result()
 
-    def turn_on_tv(self, tv_id):
-        self.send_command(tv_id, self.tvs[tv_id]['on_cmd'])
+    def turn_off_tv(self, tv_id, force=False):
+        return self.set_power(tv_id, 'off', force).result()
 
-    def turn_off_tv(self, tv_id):
-        self.send_command(tv_id, self.tvs[tv_id]['off_cmd'])
+    def turn_on_all_tvs(self, force=False):
+        return self.set_power_many(self.tvs, 'on', force)
 
-    def turn_on_all_tvs(self):
-        for tv_id in self.tvs:
-            self.turn_on_tv(tv_id)
+    def turn_off_all_tvs(self, force=False):
+        return self.set_power_many(self.tvs, 'off', force)
 
-    def turn_off_all_tvs(self):
-        for tv_id in self.tvs:
-            self.turn_off_tv(tv_id)
+    def close(self):
+        for scheduler in self.schedulers.values():
+            scheduler.close()
+        for transport in self.transports.values():
+            transport.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Control TVs via RS232")
@@ -67,4 +293,5 @@ if __name__ == "__main__":
         if args.action == "on":
             controller.turn_on_all_tvs()
         else:
-            controller.turn_off_all_tvs()
\ No newline at end of file
+            controller.turn_off_all_tvs()
+    controller.close()
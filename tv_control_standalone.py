@@ -1,24 +1,59 @@
-from tv_control import TVController
 import argparse
+import tv_daemon
 
 def main():
     parser = argparse.ArgumentParser(description="Control TVs via RS232")
-    parser.add_argument("action", choices=["on", "off"], help="Turn TVs on or off")
+    parser.add_argument("action", nargs="?", choices=["on", "off", "status"], help="Turn TVs on or off, or show their state")
     parser.add_argument("--tv", help="Specific TV to control (e.g., tv1, tv2)")
+    parser.add_argument("--force", action="store_true", help="Send even if the TV already confirmed that state")
+    parser.add_argument("--daemon", action="store_true", help="Keep the serial ports open and serve requests on a loopback port")
+    parser.add_argument("--port", type=int, default=tv_daemon.DEFAULT_PORT, help="Loopback port of the daemon")
+    parser.add_argument("--direct", action="store_true", help="Open the serial ports directly instead of using a running daemon")
     args = parser.parse_args()
 
+    if args.daemon:
+        from tv_control import TVController
+        tv_daemon.serve(TVController(), port=args.port)
+        return
+    if args.action is None:
+        parser.error("an action is required unless --daemon is given")
+
+    # A running daemon answers without re-reading config.ini or re-opening ports
+    if not args.direct:
+        if args.action == "status":
+            reply = tv_daemon.status(port=args.port)
+        else:
+            reply = tv_daemon.set_power(args.action, args.tv, args.force, port=args.port)
+        if reply is not None:
+            print_reply(reply)
+            return
+
+    # serial is only imported when there is no daemon to talk to
+    from tv_control import TVController
     controller = TVController()
 
-    if args.tv:
+    if args.action == "status":
+        for tv_id, tv in controller.tvs.items():
+            print(f"{tv_id}: {tv['brand']} on {tv['port']}, power unknown (no daemon running)")
+    elif args.tv:
         if args.action == "on":
-            controller.turn_on_tv(args.tv)
+            controller.turn_on_tv(args.tv, args.force)
         else:
-            controller.turn_off_tv(args.tv)
+            controller.turn_off_tv(args.tv, args.force)
     else:
         if args.action == "on":
-            controller.turn_on_all_tvs()
+            controller.turn_on_all_tvs(args.force)
         else:
-            controller.turn_off_all_tvs()
+            controller.turn_off_all_tvs(args.force)
+    controller.close()
+
+def print_reply(reply):
+    if 'error' in reply:
+        print(reply['error'])
+    for tv_id, result in reply.get('results', {}).items():
+        print(f"{tv_id}: {result}")
+    for tv_id, tv in reply.get('tvs', {}).items():
+        print(f"{tv_id}: {tv['brand']} on {tv['port']}, power {tv['power'] or 'unknown'}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,96 @@
+import http.client
+import json
+import socket
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+CONNECT_TIMEOUT = 0.5  # Seconds; a missing daemon should fall back quickly
+
+class TVRequestHandler(BaseHTTPRequestHandler):
+    # POST /on, POST /off (optional ?tv=tv1) and GET /status, all JSON
+    def do_GET(self):
+        if urlparse(self.path).path != '/status':
+            return self.reply(404, {'error': 'not found'})
+        controller = self.server.controller
+        self.reply(200, {
+            'tvs': {tv_id: {'port': tv['port'], 'brand': tv['brand'],
+                            'power': controller.power_state(tv_id)}
+                    for tv_id, tv in controller.tvs.items()}
+        })
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        action = url.path.strip('/')
+        if action not in ('on', 'off'):
+            return self.reply(404, {'error': 'not found'})
+        query = parse_qs(url.query)
+        controller = self.server.controller
+        force = query.get('force', ['0'])[0] == '1'
+        tv_ids = query.get('tv') or list(controller.tvs)
+        unknown = [tv_id for tv_id in tv_ids if tv_id not in controller.tvs]
+        if unknown:
+            return self.reply(404, {'error': f"unknown TV: {', '.join(unknown)}"})
+        self.reply(200, {'results': controller.set_power_many(tv_ids, action, force)})
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Schedulers call this several times a minute; keep stdout quiet
+
+def serve(controller, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    # Keeps the controller, its open ports and power-state cache alive between
+    # requests. Binds to loopback by default so only local scripts can use it.
+    server = ThreadingHTTPServer((host, port), TVRequestHandler)
+    server.daemon_threads = True
+    server.controller = controller
+    print(f"TV control daemon listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        controller.close()
+
+def request(method, path, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=30):
+    # Returns the decoded JSON reply, or None when no daemon is listening.
+    # Once connected, the daemon owns the serial ports, so a failure after
+    # that comes back as {'error': ...} rather than None: falling back to
+    # opening the ports directly would fight the daemon for them.
+    connection = http.client.HTTPConnection(host, port, timeout=CONNECT_TIMEOUT)
+    try:
+        try:
+            connection.connect()
+        except (ConnectionRefusedError, socket.timeout):
+            return None
+        try:
+            connection.sock.settimeout(timeout)  # Power commands may retry for a few seconds
+            connection.request(method, path)
+            response = connection.getresponse()
+            return json.loads(response.read() or b'{}')
+        except socket.timeout:
+            return {'error': f"The TV daemon on port {port} did not answer within {timeout} seconds"}
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            return {'error': f"Error talking to the TV daemon on port {port}: {e}"}
+    finally:
+        connection.close()
+
+def set_power(action, tv=None, force=False, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    query = []
+    if tv:
+        query.append(f"tv={tv}")
+    if force:
+        query.append("force=1")
+    path = f"/{action}" + (f"?{'&'.join(query)}" if query else '')
+    return request('POST', path, host, port)
+
+def status(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    return request('GET', '/status', host, port)
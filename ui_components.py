@@ -1,47 +1,368 @@
+import glob
+import hashlib
+import math
+import os
 import tkinter as tk
+from collections import OrderedDict
 from tkinter import ttk
-from PIL import Image, ImageTk
-
-def load_background_image(image_path, window_width, window_height):
-    try:
-        image = Image.open(image_path)
-        image_width = int(window_width * 1.5)
-        image_height = int(image_width / image.width * image.height)
-        image = image.resize((image_width, image_height), Image.LANCZOS)
-        
-        image_with_opacity = Image.new("RGBA", image.size, (0, 0, 0, 0))
-        image_with_opacity.paste(image, (0, 0), image)
-        
-        data = image_with_opacity.getdata()
-        new_data = [(d[0], d[1], d[2], int(d[3] * 0.15)) for d in data]
-        image_with_opacity.putdata(new_data)
-        
-        return ImageTk.PhotoImage(image_with_opacity)
-    except Exception as e:
-        print(f"Error loading background image: {e}")
-        return None
-
-class ScrollableFrame(ttk.Frame):
+from source_registry import SourceRegistry
+
+BACKGROUND_SCALE = 1.5  # The logo is drawn 1.5 times wider than the screen
+BACKGROUND_OPACITY = 0.15
+
+def cache_dir():
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.path.join(base, 'NDIDecoderControl')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def background_cache_path(image_path, window_width, window_height, opacity):
+    mtime = os.stat(image_path).st_mtime_ns
+    key = f"{os.path.abspath(image_path)}|{mtime}|{window_width}x{window_height}|{opacity}"
+    return os.path.join(cache_dir(), f"background-{hashlib.sha1(key.encode()).hexdigest()[:16]}.png")
+
+def render_background_image(image_path, window_width, opacity, output_path):
+    from PIL import Image  # Only needed when there is no cached copy yet
+
+    image = Image.open(image_path).convert("RGBA")
+    image_width = int(window_width * BACKGROUND_SCALE)
+    image_height = int(image_width / image.width * image.height)
+    image = image.resize((image_width, image_height), Image.LANCZOS)
+
+    # Scale the alpha band in one pass through a lookup table rather than
+    # rebuilding every pixel as a Python tuple
+    image.putalpha(image.getchannel("A").point(lambda a: int(a * opacity)))
+
+    # Replace stale renders (old logo, other screen sizes) atomically
+    tmp_path = output_path + ".tmp"
+    image.save(tmp_path, "PNG", compress_level=1)
+    os.replace(tmp_path, output_path)
+    for old_path in glob.glob(os.path.join(os.path.dirname(output_path), "background-*.png")):
+        if old_path != output_path:
+            os.remove(old_path)
+
+def prepare_background_image(image_path, window_width, window_height, opacity=BACKGROUND_OPACITY):
+    # Returns the cached PNG, rendering it first if needed. Does not touch Tk,
+    # so it can run on a worker thread.
+    cache_path = background_cache_path(image_path, window_width, window_height, opacity)
+    if not os.path.exists(cache_path):
+        render_background_image(image_path, window_width, opacity, cache_path)
+    return cache_path
+
+# Roughly one display frame; bursts of layout requests collapse into one pass
+FRAME_MS = 16
+
+class ScrollableCanvas(ttk.Frame):
+    # Canvas with a vertical scrollbar. The scrollregion comes from
+    # content_size() and is recomputed at most once per frame, however many
+    # <Configure> events a layout pass fires.
+    def __init__(self, container, *args, bg=None, **kwargs):
+        super().__init__(container, *args, **kwargs)
+        self.canvas = tk.Canvas(self)
+        if bg:
+            self.canvas.configure(bg=bg)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.scrollregion_job = None
+
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+    def content_size(self):
+        return self.canvas.winfo_width(), self.canvas.winfo_height()
+
+    def schedule_scrollregion(self, event=None):
+        if self.scrollregion_job is None:
+            self.scrollregion_job = self.after(FRAME_MS, self.update_scrollregion)
+
+    def update_scrollregion(self):
+        if self.scrollregion_job is not None:
+            self.after_cancel(self.scrollregion_job)
+            self.scrollregion_job = None
+        width, height = self.content_size()
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+
+class ScrollableFrame(ScrollableCanvas):
+    # Widgets go in scrollable_frame; its requested size is the scrollregion
     def __init__(self, container, *args, **kwargs):
         super().__init__(container, *args, **kwargs)
-        canvas = tk.Canvas(self)
-        scrollbar = ttk.Scrollbar(self, orient="vertical", command=canvas.yview)
-        self.scrollable_frame = ttk.Frame(canvas)
+        self.scrollable_frame = ttk.Frame(self.canvas)
+        self.scrollable_frame.bind("<Configure>", self.schedule_scrollregion)
+        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+
+    def content_size(self):
+        return self.scrollable_frame.winfo_reqwidth(), self.scrollable_frame.winfo_reqheight()
+
+class VirtualList(ScrollableCanvas):
+    # Scrolling list of equal-height rows (a grid with columns > 1) that only
+    # has widgets for the cells in view. make_cell(parent) builds a widget and
+    # render_cell(widget, index) points it at an item; widgets are recycled
+    # as the list scrolls, so 500 items cost about what a screenful does.
+    # With fill=True, rows stretch to share the height while they all fit.
+    def __init__(self, container, make_cell, render_cell, row_height=60, columns=1, pad=0,
+                 fill=False, **kwargs):
+        super().__init__(container, **kwargs)
+        self.make_cell = make_cell
+        self.render_cell = render_cell
+        self.min_row_height = row_height
+        self.row_height = row_height
+        self.columns = columns
+        self.pad = pad
+        self.fill = fill
+        self.count = 0
+        self.cells = []  # [canvas window, widget, item index or None]
+        self.geometry = None
+        self.render_job = None
+        self.canvas.configure(highlightthickness=0, yscrollincrement=row_height,
+                              yscrollcommand=self.on_scroll)
+        self.canvas.bind("<Configure>", self.schedule_render)
+        self.bind_wheel(self.canvas)
+
+    def set_count(self, count, columns=None):
+        self.count = count
+        if columns:
+            self.columns = columns
+        self.geometry = None  # Every cell is placed and rendered again
+        self.render()
+
+    def refresh(self, index=None):
+        # Re-renders one item, if it is on screen, or every visible item
+        for widget, shown in self.visible_cells():
+            if index is None or shown == index:
+                self.render_cell(widget, shown)
+
+    def visible_cells(self):
+        return [(widget, index) for _, widget, index in self.cells if index is not None]
+
+    def see(self, index):
+        total = self.rows() * self.row_height
+        top = self.canvas.canvasy(0)
+        y = index // self.columns * self.row_height
+        if total and (y < top or y + self.row_height > top + self.canvas.winfo_height()):
+            self.canvas.yview_moveto(y / total)
 
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(
-                scrollregion=canvas.bbox("all")
-            )
-        )
+    def rows(self):
+        return math.ceil(self.count / self.columns)
 
-        canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+    def content_size(self):
+        return self.canvas.winfo_width(), self.rows() * self.row_height
 
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+    def update_scrollregion(self):
+        super().update_scrollregion()
+        # The scrollbar only takes room when there is something to scroll
+        if self.content_size()[1] > self.canvas.winfo_height():
+            if not self.scrollbar.winfo_manager():
+                self.scrollbar.pack(side="right", fill="y", before=self.canvas)
+        elif self.scrollbar.winfo_manager():
+            self.scrollbar.pack_forget()
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.render()
+
+    def schedule_render(self, event=None):
+        if self.render_job is None:
+            self.render_job = self.after(FRAME_MS, self.render)
+
+    def render(self):
+        if self.render_job is not None:
+            self.after_cancel(self.render_job)
+            self.render_job = None
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        row_height = self.min_row_height
+        if self.fill and self.count:
+            row_height = max(row_height, height // self.rows())
+        # One row more than fits: a scrolled view shows part of two rows
+        capacity = min(self.count, (height // row_height + 2) * self.columns)
+
+        geometry = (width, height, row_height, self.columns, self.count)
+        if geometry != self.geometry:
+            self.geometry = geometry
+            self.row_height = row_height
+            self.canvas.configure(yscrollincrement=row_height)
+            self.update_scrollregion()
+            for cell in self.cells:
+                cell[2] = None
+            while len(self.cells) < capacity:
+                widget = self.make_cell(self.canvas)
+                self.bind_wheel(widget)
+                self.cells.append([self.canvas.create_window(0, 0, window=widget, anchor='nw'), widget, None])
+            for window, widget, _ in self.cells[capacity:]:
+                self.canvas.delete(window)
+                widget.destroy()
+            del self.cells[capacity:]
+        if not capacity:
+            return
+
+        # Item i always lands in cell i % capacity, so scrolling by a row
+        # renders one row of cells and leaves the rest alone
+        cell_width = width // self.columns
+        first = int(self.canvas.canvasy(0)) // row_height * self.columns
+        shown = range(max(first, 0), min(first + capacity, self.count))
+        for index in shown:
+            cell = self.cells[index % capacity]
+            if cell[2] != index:
+                window, widget, _ = cell
+                self.canvas.coords(window, index % self.columns * cell_width + self.pad,
+                                   index // self.columns * row_height + self.pad)
+                self.canvas.itemconfigure(window, width=cell_width - 2 * self.pad,
+                                          height=row_height - 2 * self.pad, state='normal')
+                self.render_cell(widget, index)
+                cell[2] = index
+        for cell in self.cells:
+            if cell[2] is not None and cell[2] not in shown:
+                self.canvas.itemconfigure(cell[0], state='hidden')
+                cell[2] = None
+
+    def bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self.on_wheel)
+        widget.bind("<Button-4>", self.on_wheel)  # X11 reports the wheel as buttons 4 and 5
+        widget.bind("<Button-5>", self.on_wheel)
+
+    def on_wheel(self, event):
+        self.canvas.yview_scroll(-1 if event.num == 4 or event.delta > 0 else 1, "units")
 
 def create_button(parent, text, command, **kwargs):
     return tk.Button(parent, text=text, command=command, **kwargs)
 
+# Source grid columns stop growing here; bigger catalogs scroll rather than
+# shrinking every button
+MAX_GRID_COLUMNS = 6
+MIN_CELL_HEIGHT = 90
+
+class ThumbnailCache:
+    # Preview PhotoImages by source, dropped least recently used first once
+    # their decoded size passes max_bytes. Tk thread only.
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.images = OrderedDict()
+        self.size = 0
+
+    def get(self, key):
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+        return image
+
+    def put(self, key, data):
+        # Returns (added, evicted keys). A refresh loads into the existing
+        # image, which Tk redraws in place wherever it is shown.
+        image = self.images.get(key)
+        added = image is None
+        if added:
+            image = self.images[key] = tk.PhotoImage(data=data)
+        else:
+            self.size -= image_bytes(image)
+            image.configure(data=data)
+            self.images.move_to_end(key)
+        self.size += image_bytes(image)
+        evicted = []
+        while self.size > self.max_bytes and len(self.images) > 1:
+            old_key, old_image = self.images.popitem(last=False)
+            self.size -= image_bytes(old_image)
+            evicted.append(old_key)
+        return added, evicted
+
+def image_bytes(image):
+    return image.width() * image.height() * 4
+
+class SourceGrid(VirtualList):
+    # Square-ish grid of source buttons that stretches to fill the frame and
+    # scrolls once rows would get shorter than MIN_CELL_HEIGHT. Only the
+    # buttons on screen exist, and a switch only repaints the buttons whose
+    # highlight changes. on_visible(sources) hears which sources are on
+    # screen whenever that changes.
+    def __init__(self, parent, on_select, bg='#1c1c1e', button_bg='#333333',
+                 active_bg='#3b3b3d', font_size=20, on_visible=None, **kwargs):
+        super().__init__(parent, self.make_button, self.render_button, row_height=MIN_CELL_HEIGHT,
+                         pad=5, fill=True, bg=bg, **kwargs)
+        self.on_select = on_select
+        self.on_visible = on_visible
+        self.visible = ()
+        self.thumbnails = None
+        self.button_bg = button_bg
+        self.active_bg = active_bg
+        self.font_size = font_size
+        self.registry = SourceRegistry()
+        self.source_by_button = {}  # Recycled buttons -> the NDI name they show now
+        self.active_index = None
+        self.reachable = None  # Sources the decoder can see; None when unknown
+
+    def make_button(self, parent):
+        btn = tk.Button(parent, relief='flat', activebackground='#555555', activeforeground='white',
+                        font=("Roboto", self.font_size))
+        btn.config(command=lambda: self.on_select(self.source_by_button[btn]))
+        return btn
+
+    def render_button(self, btn, index):
+        source = self.registry.sources[index]
+        self.source_by_button[btn] = source.ndi_name
+        image = self.thumbnails.get(source.ndi_name) if self.thumbnails is not None else None
+        btn.config(text=source.name, image=image or '', compound='top',
+                   bg=self.active_bg if index == self.active_index else self.button_bg,
+                   fg=self.foreground(source.ndi_name))
+
+    def render(self):
+        super().render()
+        if self.on_visible is not None:
+            visible = tuple(self.registry.sources[index] for index in sorted(index for _, index in self.visible_cells()))
+            if visible != self.visible:
+                self.visible = visible
+                self.on_visible(visible)
+
+    def set_thumbnails(self, thumbnails, height=0):
+        # Rows grow by the preview height; None turns previews off
+        self.thumbnails = thumbnails
+        self.min_row_height = MIN_CELL_HEIGHT + (height if thumbnails is not None else 0)
+        self.set_count(self.count)
+
+    def set_preview(self, source, data):
+        # Stores a fetched preview; only a new or evicted image needs its
+        # button reconfigured
+        if self.thumbnails is None:
+            return
+        added, evicted = self.thumbnails.put(source, data)
+        for key in ([source] if added else []) + evicted:
+            position = self.registry.position(key)
+            if position is not None:
+                self.refresh(position)
+
+    def set_sources(self, registry):
+        if registry.sources == self.registry.sources:
+            return
+        self.registry = registry
+        self.source_by_button = {}
+        self.active_index = None
+        count = len(registry)
+        self.set_count(count, min(MAX_GRID_COLUMNS, math.ceil(math.sqrt(count))) if count else 1)
+
+    def foreground(self, source):
+        if self.reachable is None or source in self.reachable:
+            return 'white'
+        return '#808080'  # Dim sources the decoder cannot see right now
+
+    def set_reachable(self, reachable):
+        # Only on-screen buttons whose reachability changed are repainted;
+        # the rest pick it up when they scroll into view
+        if reachable == self.reachable:
+            return
+        previous = self.reachable
+        self.reachable = reachable
+        for btn, index in self.visible_cells():
+            source = self.registry.sources[index].ndi_name
+            if (previous is None or source in previous) != (reachable is None or source in reachable):
+                btn.config(fg=self.foreground(source))
+
+    def set_active(self, source):
+        index = self.registry.position(source)
+        if index == self.active_index:
+            return
+        previous = self.active_index
+        self.active_index = index
+        if previous is not None:
+            self.refresh(previous)
+        if index is not None:
+            self.refresh(index)
+
 # Other UI component functions...
\ No newline at end of file